@@ -1,43 +1,51 @@
 import streamlit as st
 
+from core.metrics import render
+from core.nav import sidebar_nav
+from core.workshops import default_workshop, upcoming
+
 # ---------------------------
 # Page Configuration
 # ---------------------------
 st.set_page_config(page_title="Embroidery Workshop", page_icon="🧵", layout="centered")
+sidebar_nav()
+with render("home"):
+    # Hide menu & footer
+    hide_menu_style = """
+            <style>
+            #MainMenu {visibility: hidden;}
+            footer {visibility: hidden;}
+            header {visibility: hidden;}
+            </style>
+            """
+    st.markdown(hide_menu_style, unsafe_allow_html=True)
 
-# Hide menu & footer
-hide_menu_style = """
-        <style>
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        header {visibility: hidden;}
-        </style>
-        """
-st.markdown(hide_menu_style, unsafe_allow_html=True)
-
-# ---------------------------
-# Landing Page Content
-# ---------------------------
-st.title("🧵 Welcome to Registration page of the Embroidery Workshop!")
-st.markdown(
-    """
-    ### Discover the art of embroidery!
-    Join our **exclusive embroidery workshop** where you’ll learn:
-    - The basics of hand embroidery techniques.
-    - How to stitch patters on any fabric of your choice.
-    - Creating your own beautiful design during the session on a T-shirt.
+    # ---------------------------
+    # Landing Page Content
+    # ---------------------------
+    st.title("🧵 Welcome to Registration page of the Embroidery Workshop!")
+    st.markdown("### Discover the art of embroidery!")
 
-    **Date:** 23rd August 2025  
-    **Venue:** Ikigai, Velachery, Chennai  
-    **Registration Fee:** ₹800 (includes materials)
-    """
-)
+    workshops = upcoming() or [default_workshop()]
+    for workshop in workshops:
+        fee = f"₹{workshop.fee}" + (f" ({workshop.fee_note})" if workshop.fee_note else "")
+        st.markdown(f"#### {workshop.title}")
+        if workshop.highlights:
+            st.markdown("Join our **exclusive embroidery workshop** where you’ll learn:\n"
+                        + "\n".join(f"- {item}" for item in workshop.highlights))
+        st.markdown(
+            f"""
+            **Date:** {workshop.date:%d %B %Y}  
+            **Venue:** {workshop.venue}  
+            **Registration Fee:** {fee}
+            """
+        )
 
-st.info("To register for this workshop, you need to login with your Google account.")
+    st.info("To register for a workshop, you need to login with your Google account.")
 
-# Navigation to Profile Page
-if st.button("🔐 Login to Register"):
-    st.switch_page("pages/1_Profile.py")
+    # Navigation to Profile Page
+    if st.button("🔐 Login to Register"):
+        st.switch_page("pages/1_Profile.py")
 
-# Footer note
-st.caption("Crafted with ❤️ by The Broderie Studio Workshop Team.")
+    # Footer note
+    st.caption("Crafted with ❤️ by The Broderie Studio Workshop Team.")
@@ -0,0 +1 @@
+"""Offline benchmarks for the Streamlit pages (see benchmarks/run.py)."""
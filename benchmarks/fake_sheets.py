@@ -0,0 +1,304 @@
+"""In-memory stand-ins for the Google endpoints the app talks to.
+
+`FakeSheetsSession` answers the Sheets v4 / Drive v3 requests gspread makes,
+so the real gspread Worksheet code (and our pool, quota client, snapshots
+and write queue on top of it) runs unchanged. Every request is recorded with
+its request/response sizes; latency and error statuses can be injected.
+`FakeOAuthSession` plays Google's token and userinfo endpoints for login.
+"""
+import json as _json
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import unquote
+
+import requests
+
+_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n - 1
+
+
+def col_letters(idx):
+    s = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        s = chr(65 + rem) + s
+    return s
+
+
+def split_range(rng):
+    """'Sheet1'!A2:G -> ('Sheet1', 'A2:G')."""
+    if "!" in rng:
+        title, a1 = rng.rsplit("!", 1)
+    else:
+        title, a1 = rng, ""
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, a1
+
+
+def parse_a1(a1):
+    """A1 -> (row0, col0, row1, col1) with None meaning open-ended (exclusive ends)."""
+    if not a1:
+        return 0, 0, None, None
+    start, _, end = a1.partition(":")
+    sc, sr = _A1.match(start).groups()
+    r0 = int(sr) - 1 if sr else 0
+    c0 = col_index(sc) if sc else 0
+    if not end:
+        return r0, c0, (r0 + 1 if sr else None), (c0 + 1 if sc else None)
+    ec, er = _A1.match(end).groups()
+    return r0, c0, (int(er) if er else None), (col_index(ec) + 1 if ec else None)
+
+
+class FakeSheetsSession:
+    """A requests.Session look-alike serving the Sheets v4 / Drive v3 calls.
+
+    Every request is recorded in `calls` (kind, request bytes, response
+    bytes). `latency` sleeps per request; `fail_with` returns the given
+    status for the next N requests to simulate quota errors.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.books = {}  # id -> {"title": str, "sheets": [{"title", "sheetId", "values"}]}
+        self.calls = []
+        self._fail = []
+        self._lock = threading.RLock()
+
+    # ---- seeding / inspection ------------------------------------
+    def add_spreadsheet(self, title, rows=None, sheet_title="Sheet1"):
+        sid = f"book{len(self.books) + 1}"
+        self.books[sid] = {
+            "title": title,
+            "sheets": [{"title": sheet_title, "sheetId": 0, "values": [list(r) for r in (rows or [])]}],
+        }
+        return sid
+
+    def values(self, title, sheet_title=None):
+        book = next(b for b in self.books.values() if b["title"] == title)
+        sheet = book["sheets"][0] if sheet_title is None else self._sheet(book, sheet_title)
+        return sheet["values"]
+
+    def fail_with(self, status, times=1):
+        self._fail.extend([status] * times)
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def counts(self):
+        return Counter(c["kind"] for c in self.calls)
+
+    def bytes_transferred(self):
+        return sum(c["sent"] + c["received"] for c in self.calls)
+
+    # ---- requests.Session protocol -------------------------------
+    def request(self, method, url, json=None, params=None, data=None, files=None, headers=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            kind, status, payload = self._dispatch(method.upper(), url, params or {}, json)
+            if self._fail:
+                status, payload = self._fail.pop(0), {"error": {"code": 0, "message": "injected", "status": "FAKE"}}
+                payload["error"]["code"] = status
+            body = _json.dumps(payload).encode()
+            sent = len(_json.dumps(json).encode()) if json is not None else 0
+            self.calls.append({"kind": kind, "sent": sent + len(url), "received": len(body), "status": status})
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = body
+        resp.url = url
+        resp.headers["Content-Type"] = "application/json"
+        return resp
+
+    def close(self):
+        pass
+
+    # ---- routing --------------------------------------------------
+    def _dispatch(self, method, url, params, body):
+        if url.startswith("https://www.googleapis.com/drive/v3/files"):
+            m = re.search(r'name = "([^"]*)"', params.get("q", ""))
+            files = [
+                {"id": sid, "name": b["title"], "createdTime": "", "modifiedTime": ""}
+                for sid, b in self.books.items()
+                if m is None or b["title"] == m.group(1)
+            ]
+            return "drive.list", 200, {"files": files}
+        path = url.split("/v4/spreadsheets/", 1)[1]
+        sid, _, rest = path.partition("/")
+        if ":" in sid and not rest:
+            sid, action = sid.split(":", 1)
+            if action == "batchUpdate":
+                return "batchUpdate", 200, self._batch_update(sid, body)
+        book = self.books.get(sid)
+        if book is None:
+            return "missing", 404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}}
+        if not rest:
+            return "metadata", 200, self._metadata(sid)
+        rest = rest[len("values"):]
+        if rest.startswith(":batchGet"):
+            ranges = params.get("ranges", [])
+            return "values.batchGet", 200, {
+                "spreadsheetId": sid,
+                "valueRanges": [self._get(book, r) for r in ranges],
+            }
+        if rest.startswith(":batchClear"):
+            for rng in body.get("ranges", []):
+                self._put(book, rng, None)
+            return "values.batchClear", 200, {"spreadsheetId": sid, "clearedRanges": body.get("ranges", [])}
+        if rest.startswith(":batchUpdate"):
+            for item in body.get("data", []):
+                self._put(book, item["range"], item["values"])
+            return "values.batchUpdate", 200, {"spreadsheetId": sid, "totalUpdatedRows": len(body.get("data", []))}
+        rng = unquote(rest[1:])
+        if rng.endswith(":append"):
+            return "values.append", 200, self._append(book, sid, rng[: -len(":append")], body["values"])
+        if rng.endswith(":clear"):
+            self._put(book, rng[: -len(":clear")], None)
+            return "values.clear", 200, {"spreadsheetId": sid}
+        if method == "GET":
+            return "values.get", 200, self._get(book, rng)
+        return "values.update", 200, self._put(book, rng, body["values"])
+
+    def _sheet(self, book, title):
+        for s in book["sheets"]:
+            if s["title"] == title:
+                return s
+        return book["sheets"][0] if title == "" else None
+
+    def _metadata(self, sid):
+        book = self.books[sid]
+        return {
+            "spreadsheetId": sid,
+            "properties": {"title": book["title"]},
+            "sheets": [
+                {"properties": {
+                    "title": s["title"], "sheetId": s["sheetId"], "index": i, "sheetType": "GRID",
+                    "gridProperties": {"rowCount": max(1000, len(s["values"])), "columnCount": 26},
+                }}
+                for i, s in enumerate(book["sheets"])
+            ],
+        }
+
+    def _get(self, book, rng):
+        title, a1 = split_range(rng)
+        sheet = self._sheet(book, title)
+        r0, c0, r1, c1 = parse_a1(a1)
+        rows = sheet["values"][r0:r1]
+        out = [list(row[c0:c1]) for row in rows]
+        while out and not any(out[-1]):
+            out.pop()
+        out = [self._rstrip(r) for r in out]
+        res = {"range": rng, "majorDimension": "ROWS"}
+        if out:
+            res["values"] = out
+        return res
+
+    @staticmethod
+    def _rstrip(row):
+        row = ["" if v is None else str(v) for v in row]
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+    def _put(self, book, rng, values):
+        title, a1 = split_range(rng)
+        sheet = self._sheet(book, title)
+        r0, c0, r1, c1 = parse_a1(a1)
+        grid = sheet["values"]
+        if values is None:  # clear
+            end = len(grid) if r1 is None else r1
+            for r in range(r0, min(end, len(grid))):
+                row = grid[r]
+                stop = len(row) if c1 is None else min(c1, len(row))
+                for c in range(c0, stop):
+                    row[c] = ""
+            return {}
+        for i, vals in enumerate(values):
+            r = r0 + i
+            while len(grid) <= r:
+                grid.append([])
+            row = grid[r]
+            for j, v in enumerate(vals):
+                c = c0 + j
+                while len(row) <= c:
+                    row.append("")
+                row[c] = "" if v is None else str(v)
+        n = len(values)
+        width = max((len(v) for v in values), default=0)
+        return {
+            "updatedRange": f"{title}!{col_letters(c0)}{r0 + 1}:{col_letters(c0 + max(width, 1) - 1)}{r0 + n}",
+            "updatedRows": n,
+            "updatedCells": sum(len(v) for v in values),
+        }
+
+    def _append(self, book, sid, rng, values):
+        title, _ = split_range(rng)
+        sheet = self._sheet(book, title)
+        grid = sheet["values"]
+        while grid and not any(grid[-1]):
+            grid.pop()
+        start = len(grid)
+        for vals in values:
+            grid.append(["" if v is None else str(v) for v in vals])
+        width = max((len(v) for v in values), default=1)
+        return {
+            "spreadsheetId": sid,
+            "tableRange": f"{title}!A1:{col_letters(width - 1)}{start}",
+            "updates": {
+                "spreadsheetId": sid,
+                "updatedRange": f"{title}!A{start + 1}:{col_letters(width - 1)}{start + len(values)}",
+                "updatedRows": len(values),
+                "updatedCells": sum(len(v) for v in values),
+            },
+        }
+
+    def _batch_update(self, sid, body):
+        book = self.books[sid]
+        replies = []
+        for req in body.get("requests", []):
+            if "addSheet" in req:
+                props = req["addSheet"]["properties"]
+                new_id = max(s["sheetId"] for s in book["sheets"]) + 1
+                book["sheets"].append({"title": props["title"], "sheetId": new_id, "values": []})
+                replies.append({"addSheet": {"properties": {
+                    "title": props["title"], "sheetId": new_id, "index": len(book["sheets"]) - 1,
+                    "sheetType": "GRID", "gridProperties": {"rowCount": 1000, "columnCount": 26},
+                }}})
+            else:
+                replies.append({})
+        return {"spreadsheetId": sid, "replies": replies}
+
+
+class FakeOAuthSession:
+    """Answers the OAuth token exchange and userinfo calls for one user."""
+
+    def __init__(self, email, name, picture="", latency=0.0):
+        self.userinfo = {"email": email, "name": name, "picture": picture, "email_verified": True}
+        self.latency = latency
+        self.calls = []
+
+    def _respond(self, url, payload):
+        if self.latency:
+            time.sleep(self.latency)
+        body = _json.dumps(payload).encode()
+        self.calls.append({"kind": url.rsplit("/", 1)[-1], "sent": len(url), "received": len(body)})
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = body
+        resp.url = url
+        return resp
+
+    def post(self, url, data=None, **kwargs):
+        return self._respond(url, {"access_token": "fake-access", "token_type": "Bearer", "expires_in": 3600})
+
+    def get(self, url, headers=None, **kwargs):
+        return self._respond(url, self.userinfo)
@@ -0,0 +1,261 @@
+"""Offline page benchmarks: Sheets calls, bytes and wall time per render.
+
+Pages run through Streamlit's AppTest against the in-memory fake in
+`benchmarks.fake_sheets`, so nothing talks to Google. Each scenario is
+measured cold (fresh process caches) and warm (same process, new session).
+
+    python -m benchmarks.run                        # 100, 10k and 100k rows
+    python -m benchmarks.run --rows 100 --latency 0.05
+    python -m benchmarks.run --backend sqlite --json out.json
+    python -m benchmarks.run --check                # fail if a warm budget is blown
+
+The table goes to stdout; Streamlit's bare-mode warnings go to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import core.images  # noqa: E402,F401  (imported so install() can patch it)
+import core.oauth  # noqa: E402,F401
+import core.snapshot  # noqa: E402,F401
+import core.writes  # noqa: E402,F401
+from benchmarks.fake_sheets import FakeOAuthSession, FakeSheetsSession  # noqa: E402
+from core.auth import issue_token  # noqa: E402
+from core.quota import QuotaLimiter  # noqa: E402
+from core.schema import REG_HEADERS, REG_SHEET_NAME, USER_HEADERS, USER_SHEET_NAME  # noqa: E402
+from core.sheets import SheetsPool  # noqa: E402
+
+HOME = os.path.join(ROOT, "Home.py")
+PROFILE = "pages/1_Profile.py"
+REGISTER = "pages/2_Workshop Registration.py"
+MY_REGS = "pages/3_My_Registration.py"
+
+ROW_COUNTS = (100, 10_000, 100_000)
+USER = "user1@example.com"
+
+# max Sheets calls allowed on a warm render; a new hidden full-sheet read in
+# a hot path shows up here first
+WARM_BUDGETS = {
+    "profile_autologin": 0,
+    "registration_view": 0,
+    "registration_submit": 1,   # the batched append itself
+    "my_registrations_edit": 2,  # the batched row update, and the read of its rows just before
+}
+
+
+# ------------------------------------------------------------------
+# FIXTURES
+# ------------------------------------------------------------------
+def seed_sheets(n_rows, latency=0.0) -> FakeSheetsSession:
+    n_users = max(10, n_rows // 4)
+    users = [USER_HEADERS] + [
+        [f"user{i}@example.com", f"User {i}", ""] for i in range(n_users)
+    ]
+    regs = [REG_HEADERS] + [
+        [f"User {i % n_users}", f"user{i % n_users}@example.com", f"98{i:08d}",
+         "Yes" if i % 2 else "No", "Buy" if i % 3 == 0 else "Return",
+         "200" if i % 3 == 0 else "0", "2025-08-01 10:00:00", f"bench{i:05d}", "1"]
+        for i in range(n_rows)
+    ]
+    session = FakeSheetsSession(latency)
+    session.add_spreadsheet(USER_SHEET_NAME, users)
+    session.add_spreadsheet(REG_SHEET_NAME, regs)
+    return session
+
+
+def make_secrets(backend, workdir) -> dict:
+    secrets = {
+        "google": {"client_id": "bench", "client_secret": "bench",
+                   "redirect_uri": "http://localhost:8501/Profile", "use_id_token": False},
+        "app": {"signing_key": "bench-signing-key"},
+        "gcp_service_account": {"client_email": "bench@example.iam.gserviceaccount.com"},
+        "images": {"cache_dir": os.path.join(workdir, "images")},
+        "storage": {"backend": backend, "path": os.path.join(workdir, "bench.sqlite3")},
+    }
+    return secrets
+
+
+def install(sheets_session, oauth_session):
+    """Point every already-imported core module at the fakes and drop caches."""
+    pool = SheetsPool({}, limiter=QuotaLimiter(10**9, 10**9), session=sheets_session)
+    st.cache_resource.clear()
+    for name, mod in list(sys.modules.items()):
+        if not name.startswith("core."):
+            continue
+        if hasattr(mod, "get_pool"):
+            mod.get_pool = lambda: pool
+        if hasattr(mod, "get_http"):
+            mod.get_http = lambda: oauth_session
+
+
+class Bench:
+    def __init__(self, n_rows, backend, latency, workdir):
+        self.n_rows = n_rows
+        self.backend = backend
+        self.latency = latency
+        self.workdir = workdir
+        self.secrets = make_secrets(backend, workdir)
+        self.sheets = None
+        self.oauth = None
+
+    def fresh_process(self):
+        """Simulate a server restart: new fake data, empty process caches."""
+        self.sheets = seed_sheets(self.n_rows, self.latency)
+        self.oauth = FakeOAuthSession(USER, "User 1", latency=self.latency)
+        install(self.sheets, self.oauth)
+        if self.backend == "sqlite":
+            db = self.secrets["storage"]["path"]
+            if os.path.exists(db):
+                os.remove(db)
+            from core.storage import get_storage
+            from core.storage.sync import seed_from_sheets
+            with mock.patch.object(st, "secrets", self.secrets):
+                seed_from_sheets(get_storage())
+            self.sheets.reset_calls()
+
+    def app(self, **state) -> AppTest:
+        at = AppTest.from_file(HOME, default_timeout=120)
+        for key, value in self.secrets.items():
+            at.secrets[key] = value
+        at.run()
+        for key, value in state.items():
+            at.session_state[key] = value
+        return at
+
+    def measure(self, step) -> dict:
+        self.sheets.reset_calls()
+        self.oauth.calls.clear()
+        start = time.perf_counter()
+        at = step()
+        elapsed = time.perf_counter() - start
+        errors = [e.value for e in at.exception]
+        return {
+            "calls": len(self.sheets.calls),
+            "kinds": dict(self.sheets.counts()),
+            "oauth_calls": len(self.oauth.calls),
+            "bytes": self.sheets.bytes_transferred(),
+            "ms": round(elapsed * 1000, 1),
+            "errors": errors,
+        }
+
+
+# ------------------------------------------------------------------
+# SCENARIOS
+# ------------------------------------------------------------------
+def profile_login(b: Bench):
+    at = b.app(oauth_state="bench-state")
+    at.query_params["code"] = "bench-code"
+    at.query_params["state"] = "bench-state"
+    return at.switch_page(PROFILE).run()
+
+
+def profile_autologin(b: Bench):
+    with mock.patch.object(st, "secrets", b.secrets):
+        token = issue_token(USER)
+    at = b.app()
+    at.query_params["u"] = USER
+    at.query_params["t"] = token
+    return at.switch_page(PROFILE).run()
+
+
+def registration_view(b: Bench):
+    at = b.app(logged_in=True, user_email=USER)
+    return at.switch_page(REGISTER).run()
+
+
+_submits = iter(range(10**9))
+
+
+def registration_submit(b: Bench):
+    at = b.app(logged_in=True, user_email=USER)
+    at.switch_page(REGISTER).run()
+    at.text_input[0].input("Bench User")
+    at.text_input[2].input(f"7{next(_submits):09d}")
+    return lambda: at.button[0].click().run()
+
+
+def my_registrations_edit(b: Bench):
+    at = b.app(logged_in=True, user_email=USER)
+    at.switch_page(MY_REGS).run()
+    at.text_input[0].input(f"6{next(_submits):09d}")
+    return lambda: at.button[0].click().run()
+
+
+SCENARIOS = {
+    "profile_login": profile_login,
+    "profile_autologin": profile_autologin,
+    "registration_view": registration_view,
+    "registration_submit": registration_submit,
+    "my_registrations_edit": my_registrations_edit,
+}
+# scenarios whose setup renders a page first; only the returned action is
+# timed, so "cold" here means the first submit after a restart
+INTERACTIONS = {"registration_submit", "my_registrations_edit"}
+
+
+def run_scenario(b: Bench, name) -> dict:
+    fn = SCENARIOS[name]
+    results = {}
+    for phase in ("cold", "warm"):
+        if phase == "cold":
+            b.fresh_process()
+        if name in INTERACTIONS:
+            results[phase] = b.measure(fn(b))
+        else:
+            results[phase] = b.measure(lambda: fn(b))
+    return results
+
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline page benchmarks against a fake Sheets API.")
+    parser.add_argument("--rows", type=int, action="append", help="registration rows (repeatable)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--backend", choices=("sheets", "sqlite"), default="sheets")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per API call")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a warm render exceeds its call budget")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # AppTest resolves page paths against the entrypoint
+    results, over_budget = [], []
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'rows':>7}  {'scenario':<22} {'phase':<5} {'calls':>5} {'KB':>9} {'ms':>9}  detail")
+        for n_rows in args.rows or ROW_COUNTS:
+            bench = Bench(n_rows, args.backend, args.latency, workdir)
+            for name in args.scenario or SCENARIOS:
+                for phase, r in run_scenario(bench, name).items():
+                    detail = ", ".join(f"{k}={v}" for k, v in sorted(r["kinds"].items()))
+                    if r["oauth_calls"]:
+                        detail += f" oauth={r['oauth_calls']}"
+                    if r["errors"]:
+                        detail += f" ERROR={r['errors'][0]!r}"
+                    print(f"{n_rows:>7}  {name:<22} {phase:<5} {r['calls']:>5} "
+                          f"{r['bytes'] / 1024:>9.1f} {r['ms']:>9.1f}  {detail}")
+                    results.append({"rows": n_rows, "scenario": name, "phase": phase, **r})
+                    budget = WARM_BUDGETS.get(name)
+                    if phase == "warm" and budget is not None and r["calls"] > budget:
+                        over_budget.append(f"{name} @ {n_rows} rows: {r['calls']} calls > {budget}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.check and over_budget:
+        print("\nover budget:\n  " + "\n  ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
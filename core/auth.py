@@ -0,0 +1,131 @@
+"""Remember-me tokens and the known-user set behind auto-login.
+
+A token is `<issued_at>.<expires_at>.<hmac>` over the email and both
+timestamps, so it expires without any server-side state. Whether the email
+still belongs to a known user is answered from an in-memory set that is
+loaded once, refreshed by a background thread and updated by `save_user`,
+so a returning visitor with a valid token costs no Sheets I/O.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from core.index import normalize_email
+from core.quota import BACKGROUND, priority
+from core.storage import get_storage
+
+REMEMBER_DAYS = 30
+KNOWN_EMAILS_REFRESH = 300  # seconds between background reloads
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------
+# SIGNED TOKENS
+# ------------------------------------------------------------------
+def _signing_key() -> bytes:
+    return st.secrets["app"]["signing_key"].encode()
+
+
+def _sign(email, issued_at, expires_at) -> str:
+    msg = f"{email}|{issued_at}|{expires_at}".encode()
+    digest = hmac.new(_signing_key(), msg, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def issue_token(email, now=None) -> str:
+    issued_at = int(now or time.time())
+    days = int(st.secrets["app"].get("remember_days", REMEMBER_DAYS))
+    expires_at = issued_at + days * 86400
+    return f"{issued_at}.{expires_at}.{_sign(email, issued_at, expires_at)}"
+
+
+def check_token(email, token, now=None) -> bool:
+    """Constant-time signature check plus expiry; no I/O."""
+    try:
+        issued_at, expires_at, sig = token.split(".", 2)
+        issued_at, expires_at = int(issued_at), int(expires_at)
+    except (AttributeError, ValueError):
+        return False
+    now = now or time.time()
+    if not issued_at <= now + 60 or now >= expires_at:
+        return False
+    return hmac.compare_digest(_sign(email, issued_at, expires_at), sig)
+
+
+# ------------------------------------------------------------------
+# KNOWN USERS
+# ------------------------------------------------------------------
+class KnownEmails:
+    """Normalized emails of every saved user, kept warm in the background."""
+
+    def __init__(self, load, refresh_every=KNOWN_EMAILS_REFRESH):
+        self._load = load  # () -> iterable of emails
+        self.refresh_every = refresh_every
+        self._lock = threading.Lock()
+        self._emails = None
+        self._added = set()  # adds since the current reload started
+        self._thread = None
+
+    def refresh(self):
+        with self._lock:
+            self._added = set()
+        emails = {normalize_email(e) for e in self._load()}
+        with self._lock:
+            # keep users saved while we were reading
+            self._emails = emails | self._added
+
+    def add(self, email):
+        with self._lock:
+            self._added.add(normalize_email(email))
+            if self._emails is not None:
+                self._emails.add(normalize_email(email))
+
+    def __contains__(self, email) -> bool:
+        if self._emails is None:
+            self.refresh()  # cold process: one load, then background only
+            self._start()
+        return normalize_email(email) in self._emails
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="known-emails", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.refresh_every)
+            try:
+                with priority(BACKGROUND):
+                    self.refresh()
+            except Exception:
+                log.exception("known-email refresh failed")
+
+
+@st.cache_resource(show_spinner=False)
+def get_known_emails() -> KnownEmails:
+    return KnownEmails(lambda: get_storage().load_users()["Email"])
+
+
+# ------------------------------------------------------------------
+# ROLES
+# ------------------------------------------------------------------
+def _role_emails(section) -> set:
+    return {normalize_email(e) for e in st.secrets.get(section, {}).get("emails", [])}
+
+
+def is_admin(email) -> bool:
+    """Listed in `[admin] emails`."""
+    return bool(email) and normalize_email(email) in _role_emails("admin")
+
+
+def is_organizer(email) -> bool:
+    """Listed in `[organizers] emails`; admins count as organizers."""
+    return bool(email) and (normalize_email(email) in _role_emails("organizers") or is_admin(email))
@@ -0,0 +1,84 @@
+"""Bulk registration import from XLSX/CSV.
+
+Walk-in and partner lists are validated column-wise with pandas string ops
+instead of row by row, priced with the same `EQUIP_BUY_AMOUNT` rule as the
+form, and checked against the storage duplicate index (an in-memory lookup
+per row, no API call). Everything accepted goes out through
+`Storage.append_regs`, i.e. one batched append however long the file is.
+"""
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.index import reg_key
+from core.schema import EQUIP_BUY_AMOUNT, EQUIP_CHOICES, REG_FIELDS, SHIRT_CHOICES, TIMESTAMP_FORMAT
+
+IMPORT_COLUMNS = ["Name", "Email", "Contact", "ShirtNeeded", "EquipmentChoice"]
+MAX_IMPORT_ROWS = 5000
+
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+CONTACT_PATTERN = r"^\+?\d{7,15}$"  # after dropping spaces, dashes and brackets
+
+
+def read_table(data: bytes, filename) -> pd.DataFrame:
+    """Uploaded file -> string frame with IMPORT_COLUMNS (header case/spacing ignored).
+
+    Raises ValueError for an unreadable file or missing columns.
+    """
+    try:
+        if filename.lower().endswith((".xlsx", ".xlsm")):
+            df = pd.read_excel(io.BytesIO(data), dtype=str, engine="openpyxl")
+        else:
+            df = pd.read_csv(io.BytesIO(data), dtype=str, encoding="utf-8-sig", skipinitialspace=True)
+    except Exception as e:
+        raise ValueError(f"Could not read {filename}: {e}") from e
+    wanted = {c.lower(): c for c in IMPORT_COLUMNS}
+    df = df.rename(columns=lambda c: wanted.get(str(c).replace(" ", "").lower(), c))
+    missing = [c for c in IMPORT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    if len(df) > MAX_IMPORT_ROWS:
+        raise ValueError(f"{len(df)} rows; split the file into parts of at most {MAX_IMPORT_ROWS}")
+    return df[IMPORT_COLUMNS].fillna("").astype(str).apply(lambda col: col.str.strip())
+
+
+def prepare(df, reg_exists) -> tuple:
+    """Validate and price an imported frame.
+
+    `reg_exists(name, email, contact, shirt, equip)` is the storage duplicate
+    check. Returns (accepted frame in REG_FIELDS order, rejected frame with
+    a "Problem" column).
+    """
+    df = df.copy()
+    df["ShirtNeeded"] = df["ShirtNeeded"].str.capitalize()
+    df["EquipmentChoice"] = df["EquipmentChoice"].str.capitalize()
+    digits = df["Contact"].str.replace(r"[\s\-()]", "", regex=True)
+
+    checks = [
+        (df["Name"] == "", "missing name"),
+        (~df["Email"].str.match(EMAIL_PATTERN), "invalid email"),
+        (~digits.str.match(CONTACT_PATTERN), "invalid contact number"),
+        (~df["ShirtNeeded"].isin(SHIRT_CHOICES), "ShirtNeeded must be Yes or No"),
+        (~df["EquipmentChoice"].isin(EQUIP_CHOICES), "EquipmentChoice must be Return or Buy"),
+    ]
+    problems = pd.Series("", index=df.index)
+    for mask, message in checks:
+        problems = problems.mask(mask, problems + message + "; ")
+
+    keys = pd.Series(list(map(reg_key, *(df[c] for c in IMPORT_COLUMNS))), index=df.index)
+    valid = problems == ""
+    repeated = valid & keys.duplicated()
+    problems = problems.mask(repeated, "duplicate of an earlier row in this file; ")
+    candidates = valid & ~repeated
+    existing = pd.Series(False, index=df.index)
+    existing[candidates] = [reg_exists(*k) for k in keys[candidates]]
+    problems = problems.mask(existing, "already registered; ")
+
+    ok = problems == ""
+    accepted = df[ok].copy()
+    accepted["PendingAmount"] = np.where(accepted["EquipmentChoice"] == "Buy", EQUIP_BUY_AMOUNT, 0)
+    accepted["Timestamp"] = datetime.now().strftime(TIMESTAMP_FORMAT)
+    rejected = df[~ok].assign(Problem=problems[~ok].str.rstrip("; "))
+    return accepted[REG_FIELDS], rejected
@@ -0,0 +1,79 @@
+"""Streaming roster export: registrations joined with user names and pictures.
+
+Rows are pulled from storage in chunks and written straight to an
+anonymous temp file (openpyxl write-only mode for XLSX, csv for CSV), so
+neither a full DataFrame copy nor a full in-memory workbook is built. The
+pages hand `roster_xlsx`/`roster_csv` (bound to the selected workshop) to
+`st.download_button` as callables, so nothing is generated until someone
+actually clicks.
+"""
+import csv
+import io
+import tempfile
+
+from openpyxl import Workbook
+
+from core.frames import KEY_COLUMN, to_sheet_values
+from core.schema import REG_FIELDS, REG_ID
+from core.storage import get_storage
+
+EXPORT_CHUNK = 2000  # rows per storage read
+ROSTER_HEADERS = REG_FIELDS + [REG_ID, "UserName", "Picture"]
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _user_lookup(storage) -> dict:
+    """Normalized email -> (name, picture) from one read of the users table."""
+    users = storage.load_users()
+    return dict(zip(users[KEY_COLUMN], zip(users["Name"], users["Picture"])))
+
+
+def iter_roster(event_id, chunk_rows=EXPORT_CHUNK):
+    """Yield one workshop's roster rows (ROSTER_HEADERS order) chunk by chunk."""
+    storage = get_storage()
+    users = _user_lookup(storage)
+    for chunk in storage.iter_regs(event_id, chunk_rows):
+        values = to_sheet_values(chunk, REG_FIELDS + [REG_ID]).astype(object).values.tolist()
+        for row, key in zip(values, chunk[KEY_COLUMN]):
+            name, picture = users.get(key, ("", ""))
+            yield [*row, name, picture]
+
+
+def _to_tempfile(write) -> io.FileIO:
+    """Run `write(binary_stream)` into an anonymous temp file; return it rewound.
+
+    The raw file object is what `st.download_button` accepts as file-like;
+    the OS deletes the file once it is closed.
+    """
+    raw = tempfile.TemporaryFile(buffering=0)
+    buf = io.BufferedWriter(raw, buffer_size=1 << 16)
+    write(buf)
+    buf.flush()
+    buf.detach()
+    raw.seek(0)
+    return raw
+
+
+def roster_xlsx(event_id, chunk_rows=EXPORT_CHUNK) -> io.FileIO:
+    """Roster as an XLSX file."""
+    def write(stream):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Registrations")
+        ws.append(ROSTER_HEADERS)
+        for row in iter_roster(event_id, chunk_rows):
+            ws.append(row)
+        wb.save(stream)
+    return _to_tempfile(write)
+
+
+def roster_csv(event_id, chunk_rows=EXPORT_CHUNK) -> io.FileIO:
+    """Roster as UTF-8 CSV, with a BOM so Excel reads ₹ and names correctly."""
+    def write(stream):
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        writer = csv.writer(text)
+        writer.writerow(ROSTER_HEADERS)
+        writer.writerows(iter_roster(event_id, chunk_rows))
+        text.flush()
+        text.detach()
+    return _to_tempfile(write)
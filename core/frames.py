@@ -0,0 +1,94 @@
+"""Compact, typed DataFrames for the cached user and registration tables.
+
+Sheet values arrive as strings. Kept that way, every cached frame is a
+wall of Python str objects: PendingAmount is text, Timestamp is unparsed
+and each Yes/No cell is its own object. `typed()` converts a frame once:
+
+- ShirtNeeded / EquipmentChoice become categoricals with small integer codes
+- PendingAmount and Version become int32 (a blank Version reads as 0)
+- Timestamp becomes datetime64
+- a normalized `EmailKey` column is added for lookups
+
+Appends and updates convert only the new rows and merge them in with
+`concat` / `replace_row`, which keep the category dtypes intact.
+"""
+import pandas as pd
+
+from core.schema import EQUIP_CHOICES, REG_VERSION, SHIRT_CHOICES, TIMESTAMP_FORMAT
+
+KEY_COLUMN = "EmailKey"
+CHOICES = {"ShirtNeeded": SHIRT_CHOICES, "EquipmentChoice": EQUIP_CHOICES}
+
+
+def email_key(series) -> pd.Series:
+    """Vectorized `core.index.normalize_email`."""
+    return series.astype("string").fillna("").str.strip().str.lower().astype(str)
+
+
+def _category(series, choices) -> pd.Series:
+    values = series.astype("string").str.strip().str.capitalize().replace("", pd.NA)
+    # hand-typed values outside the form's choices are kept as extra categories
+    extra = sorted(set(values.dropna().unique()) - set(choices))
+    return values.astype(object).astype(pd.CategoricalDtype(list(choices) + extra))
+
+
+def typed(frame: pd.DataFrame) -> pd.DataFrame:
+    """Typed copy of a users or registrations frame (sheet header columns)."""
+    out = frame.copy()
+    for column, choices in CHOICES.items():
+        if column in out:
+            out[column] = _category(out[column], choices)
+    for column in ("PendingAmount", REG_VERSION):
+        if column in out:
+            out[column] = pd.to_numeric(out[column], errors="coerce").fillna(0).astype("int32")
+    if "Timestamp" in out:
+        out["Timestamp"] = pd.to_datetime(out["Timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+    if "Email" in out:
+        out[KEY_COLUMN] = email_key(out["Email"])
+    return out
+
+
+def _align(a: pd.DataFrame, b: pd.DataFrame):
+    """Give both frames' categorical columns the same (merged) categories."""
+    for column in CHOICES:
+        if column in a and column in b and a[column].dtype != b[column].dtype:
+            cats = list(a[column].cat.categories)
+            cats += [c for c in b[column].cat.categories if c not in cats]
+            dtype = pd.CategoricalDtype(cats)
+            a[column] = a[column].astype(dtype)
+            b[column] = b[column].astype(dtype)
+
+
+def concat(frame: pd.DataFrame, added: pd.DataFrame) -> pd.DataFrame:
+    """Append typed rows without losing the category dtypes."""
+    if not len(frame):
+        return added
+    frame, added = frame.copy(), added.copy()
+    _align(frame, added)
+    return pd.concat([frame, added])
+
+
+def replace_row(frame: pd.DataFrame, row_key, row: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `frame` with `row_key` overwritten by the one-row typed frame `row`."""
+    frame, row = frame.copy(), row.copy()
+    _align(frame, row)
+    for column in frame.columns:
+        frame.at[row_key, column] = row[column].iloc[0]
+    return frame
+
+
+def to_sheet_values(frame: pd.DataFrame, headers) -> pd.DataFrame:
+    """`headers` columns rendered back the way the sheet stores them."""
+    out = frame[headers].copy()
+    for column in headers:
+        if column == "Timestamp":
+            out[column] = out[column].dt.strftime(TIMESTAMP_FORMAT)
+        if isinstance(out[column].dtype, pd.CategoricalDtype) or column == "Timestamp":
+            out[column] = out[column].astype(object).where(out[column].notna(), "")
+    return out
+
+
+def memory_report(frame: pd.DataFrame) -> pd.Series:
+    """Bytes per column, object payloads included."""
+    return frame.memory_usage(index=True, deep=True)
+
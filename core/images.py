@@ -0,0 +1,195 @@
+"""Profile picture processing and a content-addressed on-disk image cache.
+
+Uploads are decoded, orientation-fixed, downsized to thumbnail sizes and
+re-encoded compactly; remote Google avatars are fetched once at the size we
+display. Everything lands in a size-bounded LRU directory keyed by the
+SHA-256 of the encoded bytes, so a profile render serves a few KB from
+local disk instead of a phone photo or an external fetch.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+
+import streamlit as st
+from PIL import Image, ImageOps
+
+from core.metrics import cache_lookup
+from core.oauth import get_http
+
+CACHE_DIR = "data/images"
+CACHE_MAX_MB = 200
+AVATAR_PX = 200       # shown at 100px; 2x for high-DPI screens
+THUMB_PX = (64, AVATAR_PX)
+QUALITY = 80
+LOCAL_PREFIX = "local:"  # Picture column value for an uploaded, cached image
+
+_GOOGLE_SIZE = re.compile(r"=s\d+(-c)?$")
+
+log = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """Content-addressed blobs plus url -> blob refs, evicted least-recently-used."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "refs"), exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p in self._blobs())
+
+    def _blobs(self):
+        base = os.path.join(self.root, "blobs")
+        for sub in os.listdir(base):
+            for name in os.listdir(os.path.join(base, sub)):
+                yield os.path.join(base, sub, name)
+
+    def _path(self, digest) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _ref_path(self, key) -> str:
+        return os.path.join(self.root, "refs", hashlib.sha256(key.encode()).hexdigest())
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self._size += len(data)
+                self._evict()
+        return digest
+
+    def get(self, digest) -> bytes | None:
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        os.utime(path)  # mark as recently used
+        return data
+
+    def link(self, key, digest):
+        """Point a name (e.g. an avatar URL) at a stored blob."""
+        with open(self._ref_path(key), "w") as f:
+            f.write(digest)
+
+    def resolve(self, key) -> bytes | None:
+        try:
+            with open(self._ref_path(key)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return self.get(digest)
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for path in sorted(self._blobs(), key=os.path.getmtime):
+            self._size -= os.path.getsize(path)
+            os.remove(path)  # dangling refs just read as misses
+            if self._size <= self.max_bytes * 0.9:
+                break
+
+
+@st.cache_resource(show_spinner=False)
+def get_image_cache() -> ImageCache:
+    cfg = st.secrets.get("images", {})
+    return ImageCache(
+        cfg.get("cache_dir", CACHE_DIR),
+        int(cfg.get("max_mb", CACHE_MAX_MB)) * 1024 * 1024,
+    )
+
+
+# ------------------------------------------------------------------
+# PROCESSING
+# ------------------------------------------------------------------
+def encode_thumbnail(data: bytes, px) -> bytes:
+    """Decode, fix orientation, fit within px x px and re-encode as WebP."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            keep_alpha = img.mode in ("LA", "P") or "transparency" in img.info
+            img = img.convert("RGBA" if keep_alpha else "RGB")
+        img.thumbnail((px, px), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=QUALITY, method=4)
+        return out.getvalue()
+
+
+def process_upload(data: bytes) -> str:
+    """Store every thumbnail size of an uploaded picture.
+
+    Returns the Picture value to save (`local:<avatar digest>`); other sizes
+    are reachable through `profile_picture(value, px)`.
+    """
+    cache = get_image_cache()
+    digests = {px: cache.put(encode_thumbnail(data, px)) for px in THUMB_PX}
+    picture = LOCAL_PREFIX + digests[AVATAR_PX]
+    for px, digest in digests.items():
+        cache.link(f"{picture}|{px}", digest)
+    return picture
+
+
+# ------------------------------------------------------------------
+# REMOTE AVATARS
+# ------------------------------------------------------------------
+_inflight = set()
+_inflight_lock = threading.Lock()
+
+
+def sized_avatar_url(url, px=AVATAR_PX) -> str:
+    """Ask Google's image server for the size we show instead of the default."""
+    return _GOOGLE_SIZE.sub(f"=s{px}-c", url) if "googleusercontent.com" in url else url
+
+
+def fetch_avatar(url, px=AVATAR_PX) -> bytes | None:
+    """Download, thumbnail and cache a remote avatar."""
+    resp = get_http().get(sized_avatar_url(url, px))
+    resp.raise_for_status()
+    data = encode_thumbnail(resp.content, px)
+    cache = get_image_cache()
+    cache.link(f"{url}|{px}", cache.put(data))
+    return data
+
+
+def prefetch_avatar(url, px=AVATAR_PX):
+    """Warm the cache for `url` in the background (no-op if already running)."""
+    key = f"{url}|{px}"
+    with _inflight_lock:
+        if key in _inflight:
+            return
+        _inflight.add(key)
+
+    def work():
+        try:
+            fetch_avatar(url, px)
+        except Exception:
+            log.warning("avatar prefetch failed for %s", url, exc_info=True)
+        finally:
+            with _inflight_lock:
+                _inflight.discard(key)
+
+    threading.Thread(target=work, name="avatar-prefetch", daemon=True).start()
+
+
+def profile_picture(picture, px=AVATAR_PX):
+    """What to hand st.image for a Picture value: cached bytes when we have
+    them, otherwise the URL itself while a prefetch fills the cache."""
+    if not picture:
+        return None
+    data = get_image_cache().resolve(f"{picture}|{px}")
+    cache_lookup("images", "miss" if data is None else "hit")
+    if data is None and not picture.startswith(LOCAL_PREFIX):
+        prefetch_avatar(picture, px)
+        return picture
+    return data
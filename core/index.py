@@ -0,0 +1,257 @@
+"""In-memory indexes derived from a worksheet snapshot.
+
+An index is built once from the snapshot frame and then kept current by the
+snapshot on every local append/update, so lookups never rescan the sheet.
+"""
+import base64
+import secrets
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import pandas as pd
+
+from core.frames import KEY_COLUMN
+from core.schema import REG_FIELDS, REG_HEADERS, REG_ID, TIMESTAMP_FORMAT
+
+
+def normalize_email(email) -> str:
+    return _text(email).lower()
+
+
+def reg_key(name, email, contact, shirt_needed, equipment_choice) -> tuple:
+    """Normalized identity of a registration for duplicate detection; a blank
+    typed cell (NaN) keys like the "" of a raw sheet record."""
+    return (
+        _text(name).lower(),
+        normalize_email(email),
+        _text(contact),
+        _text(shirt_needed).lower(),
+        _text(equipment_choice).lower(),
+    )
+
+
+def new_reg_id() -> str:
+    """Random 10-character id, e.g. "k3xq7mbd2a"; 48 bits, so no registry needed."""
+    return base64.b32encode(secrets.token_bytes(6)).decode().rstrip("=").lower()
+
+
+def legacy_reg_id(row_num) -> str:
+    """Stand-in id for a sheet row written before ids existed (`@<row>`).
+    It is only a position: deleting a row by hand shifts the rows below, so
+    edits check the row's contents too. Its first edit gives the row a real id."""
+    return f"@{row_num}"
+
+
+def is_legacy_reg_id(reg_id) -> bool:
+    return str(reg_id).startswith("@")
+
+
+def with_reg_identity(row) -> list:
+    """A registration row in REG_HEADERS order, given REG_FIELDS or a full row.
+
+    A missing id or version is assigned (new id, version 1); existing ones,
+    e.g. from a sheet being seeded into SQLite, are kept.
+    """
+    row = list(row) + [""] * (len(REG_HEADERS) - len(row))
+    reg_id, version = row[len(REG_FIELDS):len(REG_HEADERS)]
+    return row[:len(REG_FIELDS)] + [reg_id or new_reg_id(), int(version or 1)]
+
+
+class EmailIndex:
+    """Normalized email -> sheet row numbers, in sheet order."""
+
+    column = "Email"
+    columns = (column,)
+
+    def __init__(self):
+        self._rows = defaultdict(list)
+
+    @classmethod
+    def build(cls, frame):
+        idx = cls()
+        if KEY_COLUMN in frame:  # typed frames carry the normalized key already
+            keys = frame[KEY_COLUMN]
+        else:
+            keys = map(normalize_email, frame[cls.column])
+        for row_num, key in zip(frame.index, keys):
+            idx._rows[key].append(int(row_num))
+        return idx
+
+    def on_append(self, row_num, record: dict):
+        self._rows[normalize_email(record[self.column])].append(row_num)
+
+    def on_update(self, row_num, old: dict, new: dict):
+        old_key = normalize_email(old[self.column])
+        new_key = normalize_email(new[self.column])
+        if old_key == new_key:
+            return
+        self._rows[old_key].remove(row_num)
+        if not self._rows[old_key]:
+            del self._rows[old_key]
+        rows = self._rows[new_key]
+        rows.append(row_num)
+        rows.sort()
+
+    def rows(self, email) -> list:
+        return list(self._rows.get(normalize_email(email), ()))
+
+    def __contains__(self, email):
+        return normalize_email(email) in self._rows
+
+
+class RegIdIndex:
+    """RegID -> sheet row number; rows without an id use `legacy_reg_id`."""
+
+    columns = (REG_ID,)
+
+    def __init__(self):
+        self._rows = {}
+
+    @staticmethod
+    def _key(row_num, record) -> str:
+        return str(record[REG_ID] or "").strip() or legacy_reg_id(row_num)
+
+    @classmethod
+    def build(cls, frame):
+        idx = cls()
+        idx._rows = {cls._key(r, {REG_ID: v}): int(r) for r, v in zip(frame.index, frame[REG_ID])}
+        return idx
+
+    def on_append(self, row_num, record: dict):
+        self._rows[self._key(row_num, record)] = row_num
+
+    def on_update(self, row_num, old: dict, new: dict):
+        self._rows.pop(self._key(row_num, old), None)
+        self._rows[self._key(row_num, new)] = row_num
+
+    def rows(self, reg_id) -> list:
+        row = self._rows.get(reg_id)
+        return [] if row is None else [row]
+
+    def __contains__(self, reg_id):
+        return reg_id in self._rows
+
+
+class DuplicateIndex:
+    """Multiset of normalized (name, email, contact, shirt, equipment) keys.
+
+    Counted rather than a plain set so editing one of two identical rows
+    doesn't make the other look unique.
+    """
+
+    columns = ("Name", "Email", "Contact", "ShirtNeeded", "EquipmentChoice")
+
+    def __init__(self):
+        self._keys = Counter()
+
+    @classmethod
+    def build(cls, frame):
+        idx = cls()
+        idx._keys.update(reg_key(*r) for r in zip(*(frame[c] for c in cls.columns)))
+        return idx
+
+    def _key(self, record):
+        return reg_key(*(record[c] for c in self.columns))
+
+    def on_append(self, row_num, record: dict):
+        self._keys[self._key(record)] += 1
+
+    def on_update(self, row_num, old: dict, new: dict):
+        old_key = self._key(old)
+        self._keys[old_key] -= 1
+        if self._keys[old_key] <= 0:
+            del self._keys[old_key]
+        self._keys[self._key(new)] += 1
+
+    def __contains__(self, key):
+        return key in self._keys
+
+
+class RegistrationStats:
+    """Organizer totals over the registrations sheet.
+
+    Built with one vectorized pass over the frame, then adjusted by the
+    contribution of each appended or rewritten row, so refreshing the
+    dashboard never re-aggregates the whole sheet.
+    """
+
+    columns = ("Email", "ShirtNeeded", "EquipmentChoice", "PendingAmount", "Timestamp")
+
+    def __init__(self):
+        self.registrations = 0
+        self.pending_total = 0
+        self._emails = Counter()
+        self._shirts = Counter()
+        self._equipment = Counter()
+        self._days = Counter()
+
+    @classmethod
+    def build(cls, frame):
+        idx = cls()
+        idx.registrations = len(frame)
+        idx.pending_total = int(pd.to_numeric(frame["PendingAmount"], errors="coerce").fillna(0).sum())
+        emails = frame[KEY_COLUMN] if KEY_COLUMN in frame else frame["Email"].map(normalize_email)
+        idx._emails.update(emails.value_counts().to_dict())
+        idx._shirts.update(_choice(frame["ShirtNeeded"]).value_counts().to_dict())
+        idx._equipment.update(_choice(frame["EquipmentChoice"]).value_counts().to_dict())
+        days = pd.to_datetime(frame["Timestamp"], format=TIMESTAMP_FORMAT, errors="coerce").dt.date
+        idx._days.update(days.dropna().value_counts().to_dict())
+        return idx
+
+    def _apply(self, record, sign):
+        self.registrations += sign
+        self.pending_total += sign * _amount(record["PendingAmount"])
+        for counter, key in (
+            (self._emails, normalize_email(record["Email"])),
+            (self._shirts, _text(record["ShirtNeeded"]).capitalize()),
+            (self._equipment, _text(record["EquipmentChoice"]).capitalize()),
+            (self._days, _day(record["Timestamp"])),
+        ):
+            if not key:
+                continue
+            counter[key] += sign
+            if counter[key] <= 0:
+                del counter[key]
+
+    def on_append(self, row_num, record: dict):
+        self._apply(record, 1)
+
+    def on_update(self, row_num, old: dict, new: dict):
+        self._apply(old, -1)
+        self._apply(new, 1)
+
+    def summary(self) -> dict:
+        """Plain copies of the current totals; safe to use outside the snapshot lock."""
+        return {
+            "registrations": self.registrations,
+            "attendees": len(self._emails),
+            "shirts": dict(self._shirts),
+            "equipment": dict(self._equipment),
+            "pending_total": self.pending_total,
+            "by_day": pd.Series(dict(self._days), dtype="int64").sort_index(),
+        }
+
+
+def _choice(series) -> pd.Series:
+    return series.astype("string").str.strip().str.capitalize().replace("", pd.NA)
+
+
+def _text(value) -> str:
+    """Cell value as stripped text; "" for missing (None/NaN/NaT)."""
+    return "" if pd.isna(value) else str(value).strip()
+
+
+def _amount(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _day(ts):
+    if isinstance(ts, datetime):  # typed frames hold Timestamps (NaT is not a datetime)
+        return ts.date()
+    try:
+        return datetime.strptime(_text(ts), TIMESTAMP_FORMAT).date()
+    except ValueError:
+        return None
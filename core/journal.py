@@ -0,0 +1,264 @@
+"""Local write-ahead journal for registration appends (Sheets backend).
+
+With `journal_dir` set under `[sheets]` in secrets, each row is fsynced to
+a local file before the page acknowledges it and replayed until it lands,
+deduplicated by RegID.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import streamlit as st
+from gspread.exceptions import APIError
+
+from core.metrics import REGISTRY
+from core.quota import BACKGROUND, priority
+from core.snapshot import get_snapshot
+from core.writes import WriteTicket, get_write_queue
+
+FILE_PREFIX = "journal-"
+DEAD_LETTER = "dead-letter.log"
+PERMANENT_STATUSES = {400, 403, 404}  # refused as sent; resending rarely helps
+GIVE_UP_AFTER = 3                     # attempts refused that way before a row is given up
+REPLAY_INTERVAL = 5.0    # seconds between replay passes while entries are outstanding
+REPLAY_BACKOFF_CAP = 300.0
+COMPACT_BYTES = 1 << 20  # truncate once nothing is outstanding and the file is this big
+
+log = logging.getLogger(__name__)
+
+
+class JournalEntry:
+    """One journaled row and the durable ticket the page holds for it."""
+
+    def __init__(self, key, sheet_name, title, values):
+        self.key = key
+        self.sheet_name = sheet_name
+        self.title = title
+        self.values = list(values)
+        self.in_flight = False
+        self.refused = 0  # attempts failed with a PERMANENT_STATUSES error
+        self.recorded_at = time.time()
+        self.ticket = WriteTicket(sheet_name, "append", values, title=title)
+        self.ticket.durable = True
+
+    def record(self) -> dict:
+        return {"op": "append", "key": self.key, "sheet": self.sheet_name,
+                "title": self.title, "values": self.values, "at": self.recorded_at}
+
+
+class WriteJournal:
+    def __init__(self, directory, queue=None, replay_interval=REPLAY_INTERVAL):
+        self.directory = directory
+        self.queue = queue or get_write_queue()
+        self.replay_interval = replay_interval
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._pending = {}   # key -> JournalEntry, in journal order
+        self._failures = 0   # consecutive failed attempts; drives the backoff
+        self._dead = 0       # rows given up since start
+        self._wake = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._file = self._claim()
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="journal-replay", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> str:
+        return self._file.name
+
+    # ---- producers -----------------------------------------------
+    def append(self, sheet_name, title, rows, keys) -> list:
+        """Record `rows` durably, then queue them; returns one durable
+        WriteTicket per row. Raises OSError if the journal can't be written."""
+        entries = [JournalEntry(key, sheet_name, title, row) for row, key in zip(rows, keys)]
+        with self._lock:
+            for entry in entries:
+                self._file.write(json.dumps(entry.record()).encode() + b"\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending.update((entry.key, entry) for entry in entries)
+        REGISTRY.inc("app_journal_entries_total", len(entries), outcome="recorded")
+        self._dispatch(entries)
+        return [entry.ticket for entry in entries]
+
+    def pending_rows(self, sheet_name, title) -> list:
+        """Rows recorded for worksheet `title` of `sheet_name` but not yet
+        confirmed in the sheet, so lookups can count them before they land."""
+        with self._lock:
+            return [e.values for e in self._pending.values()
+                    if e.sheet_name == sheet_name and e.title == title]
+
+    def status(self) -> dict:
+        """Outstanding rows, the age of the oldest and the last error, for the admin page."""
+        with self._lock:
+            oldest = min((e.recorded_at for e in self._pending.values()), default=None)
+            return {
+                "pending": len(self._pending),
+                "dead": self._dead,
+                "oldest_seconds": None if oldest is None else round(time.time() - oldest, 1),
+                "last_error": self.last_error,
+                "path": self.path,
+            }
+
+    # ---- journal file --------------------------------------------
+    def _claim(self):
+        """Lock a journal file of our own: one left unlocked by a process that
+        has exited, else a new one."""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.startswith(FILE_PREFIX):
+                continue
+            f = open(os.path.join(self.directory, name), "a+b")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                f.close()
+        f = open(os.path.join(self.directory, f"{FILE_PREFIX}{uuid.uuid4().hex[:12]}.log"), "a+b")
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+
+    def _recover(self):
+        """Reload rows recorded but never confirmed by an earlier run."""
+        self._file.seek(0)
+        for line in self._file:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # a line torn by a crash mid-write was never acknowledged
+            if rec.get("op") == "append":
+                self._pending[rec["key"]] = JournalEntry(rec["key"], rec["sheet"], rec["title"], rec["values"])
+            elif rec.get("op") in ("done", "dead"):
+                self._pending.pop(rec["key"], None)
+        if self._pending:
+            log.info("Journal %s: replaying %d unconfirmed row(s)", self.path, len(self._pending))
+            self._wake.set()
+
+    def _confirm(self, entry, row_num=None, version=None, outcome="written"):
+        with self._lock:
+            if self._pending.pop(entry.key, None) is None:
+                return
+            # no fsync: a lost "done" only means a replay, which the RegID check skips
+            self._file.write(json.dumps({"op": "done", "key": entry.key}).encode() + b"\n")
+            self._file.flush()
+            if not self._pending and self._file.tell() > COMPACT_BYTES:
+                self._file.truncate(0)
+                os.fsync(self._file.fileno())
+        REGISTRY.inc("app_journal_entries_total", outcome=outcome)
+        entry.ticket.resolve(row_num=row_num, version=version)
+
+    def _refused(self, entry, error) -> bool:
+        """Count a permanent-looking failure; True once the row was given up."""
+        if not _permanent(error):
+            return False
+        entry.refused += 1
+        if entry.refused < GIVE_UP_AFTER:
+            return False
+        self._bury(entry, error)
+        return True
+
+    def _bury(self, entry, error):
+        """Give up on a row Google refuses: move it to the dead-letter file
+        and fail its ticket."""
+        reason = f"{type(error).__name__}: {error}"
+        with self._lock:
+            if self._pending.pop(entry.key, None) is None:
+                return
+            with open(os.path.join(self.directory, DEAD_LETTER), "ab") as f:
+                f.write(json.dumps(dict(entry.record(), error=reason)).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.write(json.dumps({"op": "dead", "key": entry.key}).encode() + b"\n")
+            self._file.flush()
+            self._dead += 1
+        self.last_error = reason
+        log.error("Journal: gave up on %s row %s: %s", entry.sheet_name, entry.key, reason)
+        REGISTRY.inc("app_journal_entries_total", outcome="dead")
+        entry.ticket.resolve(error=error)
+
+    # ---- sending -------------------------------------------------
+    def _dispatch(self, entries):
+        """Hand entries to the write queue, grouped so each group is one append."""
+        groups = {}
+        for entry in entries:
+            entry.in_flight = True
+            groups.setdefault((entry.sheet_name, entry.title), []).append(entry)
+        for (sheet_name, title), group in groups.items():
+            tickets = self.queue.append_many(sheet_name, [e.values for e in group], title)
+            for entry, ticket in zip(group, tickets):
+                ticket.add_done_callback(lambda t, entry=entry: self._settled(entry, t))
+
+    def _settled(self, entry, ticket):
+        if ticket.error is None:
+            self._failures = 0
+            self._confirm(entry, ticket.row_num, ticket.version)
+            return
+        entry.in_flight = False
+        if self._refused(entry, ticket.error):
+            return
+        # keep it journaled; the replayer sends it again after a backoff
+        self._failures += 1
+        self.last_error = f"{type(ticket.error).__name__}: {ticket.error}"
+        REGISTRY.inc("app_journal_entries_total", outcome="retried")
+
+    # ---- replayer ------------------------------------------------
+    def _run(self):
+        while True:
+            delay = min(self.replay_interval * 2 ** min(self._failures, 10), REPLAY_BACKOFF_CAP)
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                with priority(BACKGROUND):
+                    self._replay()
+            except Exception as e:
+                self._failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.exception("Journal replay failed")
+
+    def _replay(self):
+        """Send every outstanding entry not already in flight, minus those
+        whose RegID the sheet already holds."""
+        with self._lock:
+            due = [e for e in self._pending.values() if not e.in_flight]
+        groups = {}
+        for entry in due:
+            groups.setdefault((entry.sheet_name, entry.title), []).append(entry)
+        for (sheet_name, title), group in groups.items():
+            # one worksheet failing doesn't hold up the others
+            try:
+                self._replay_group(sheet_name, title, group)
+            except Exception as e:
+                if all([self._refused(entry, e) for entry in group]):
+                    continue
+                self._failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.exception("Journal replay of %s failed", sheet_name)
+
+    def _replay_group(self, sheet_name, title, group):
+        snap = get_snapshot(sheet_name, title)
+        snap.expire()  # the delta read brings in rows that landed unacknowledged
+        ids = snap.index("id")
+        resend = []
+        for entry in group:
+            rows = ids.rows(entry.key)
+            if rows:
+                self._confirm(entry, rows[0], snap.version, outcome="deduped")
+            else:
+                resend.append(entry)
+        if resend:
+            self._dispatch(resend)
+
+
+def _permanent(error) -> bool:
+    return isinstance(error, APIError) and error.code in PERMANENT_STATUSES
+
+
+@st.cache_resource(show_spinner=False)
+def get_journal():
+    """The process's `WriteJournal`, or None when `journal_dir` isn't configured."""
+    directory = st.secrets.get("sheets", {}).get("journal_dir")
+    return WriteJournal(directory) if directory else None
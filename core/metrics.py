@@ -0,0 +1,282 @@
+"""In-process counters and latency histograms for the hot paths.
+
+Every Sheets request, every OAuth HTTP call, each page script run and the
+page data helpers record into one process-wide `REGISTRY`. Each Sheets call
+is also charged to the page whose script thread made it, so a slow render
+can be split into "Google was slow" (request latency) and "we made eight
+calls" (calls per render). The admin page reads the registry directly;
+`get_exporter()` also writes it to a Prometheus text-format file for the
+node_exporter textfile collector.
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+# seconds; covers a cached render (~ms) up to a retried, throttled Sheets call
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)  # external calls per render
+
+DEFAULT_TEXTFILE = "data/metrics.prom"
+EXPORT_INTERVAL = 15  # seconds between textfile writes
+
+BACKGROUND_PAGE = "background"  # calls made outside a page script run
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------
+# REGISTRY
+# ------------------------------------------------------------------
+class Histogram:
+    """Cumulative-bucket histogram, as in the Prometheus exposition format."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    """Named counters and histograms keyed by sorted label tuples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def snapshot(self):
+        """(counters, histograms) copied under the lock, labels as dicts."""
+        with self._lock:
+            counters = {
+                name: [(dict(k), v) for k, v in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {}
+            for name, series in self._histograms.items():
+                rows = []
+                for k, h in series.items():
+                    copy = Histogram(h.buckets)
+                    copy.counts, copy.sum, copy.count = list(h.counts), h.sum, h.count
+                    rows.append((dict(k), copy))
+                histograms[name] = rows
+        return counters, histograms
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        counters, histograms = self.snapshot()
+        lines = []
+        for name, rows in sorted(counters.items()):
+            _header(lines, name, "counter", self._help.get(name))
+            for labels, value in rows:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        for name, rows in sorted(histograms.items()):
+            _header(lines, name, "histogram", self._help.get(name))
+            for labels, h in rows:
+                seen = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    seen += n
+                    lines.append(f"{name}_bucket{_labels(labels, le=bound)} {seen}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {h.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {h.sum:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(lines, name, kind, text):
+    if text:
+        lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(labels, **extra) -> str:
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+REGISTRY.describe("app_page_render_seconds", "Wall time of one page script run or fragment rerun.")
+REGISTRY.describe("app_page_external_calls", "Sheets and OAuth calls made by one page script run or fragment rerun.")
+REGISTRY.describe("app_function_seconds", "Wall time of an instrumented data helper.")
+REGISTRY.describe("app_sheets_requests_total", "Sheets/Drive HTTP requests, including retries.")
+REGISTRY.describe("app_sheets_request_seconds", "Latency of one Sheets/Drive HTTP request.")
+REGISTRY.describe("app_sheets_quota_wait_seconds", "Time spent waiting for a client-side quota token.")
+REGISTRY.describe("app_oauth_requests_total", "Google OAuth HTTP requests.")
+REGISTRY.describe("app_oauth_request_seconds", "Latency of one Google OAuth HTTP request.")
+REGISTRY.describe("app_cache_requests_total", "Cache lookups by cache and result (hit, miss, delta, shared).")
+REGISTRY.describe("app_journal_entries_total", "Journaled rows by outcome (recorded, written, deduped, retried, dead).")
+
+
+# ------------------------------------------------------------------
+# PAGE RENDERS
+# ------------------------------------------------------------------
+_render = threading.local()  # Streamlit runs each session's script in its own thread
+_tally_lock = threading.Lock()  # a render's call count may be shared with `in_render` workers
+
+
+def current_page() -> str:
+    return getattr(_render, "page", None) or BACKGROUND_PAGE
+
+
+@contextlib.contextmanager
+def render(page):
+    """Time one script run of `page`; the page body runs inside it.
+
+    The run is recorded however it ends, st.stop/st.rerun/st.switch_page
+    included. Also usable as a decorator under `@st.fragment`: called by
+    the full run it does nothing, and on a fragment rerun it records that
+    run as one of `page`, so its calls aren't charged to background.
+    """
+    if getattr(_render, "page", None) is not None:
+        yield
+        return
+    get_exporter()
+    _render.page = page
+    _render.started = time.perf_counter()
+    _render.calls = [0]
+    try:
+        yield
+    finally:
+        REGISTRY.observe("app_page_render_seconds", time.perf_counter() - _render.started, page=page)
+        REGISTRY.observe("app_page_external_calls", _render.calls[0], buckets=CALL_BUCKETS, page=page)
+        _render.page = None
+
+
+def external_call(kind, endpoint, status, seconds):
+    """Count one outbound request against the current page and render."""
+    page = current_page()
+    if kind == "sheets":
+        REGISTRY.inc("app_sheets_requests_total", page=page, endpoint=endpoint, status=status)
+        REGISTRY.observe("app_sheets_request_seconds", seconds, endpoint=endpoint)
+    else:
+        REGISTRY.inc("app_oauth_requests_total", page=page, endpoint=endpoint, status=status)
+        REGISTRY.observe("app_oauth_request_seconds", seconds, endpoint=endpoint)
+    if getattr(_render, "page", None) is not None:
+        with _tally_lock:
+            _render.calls[0] += 1
+
+
+def in_render(fn):
+    """Wrap `fn` to run on a worker thread as part of the caller's render.
+
+    Its requests are charged to the calling page and counted in its render,
+    and it runs in a copy of the caller's context (e.g. quota priority).
+    """
+    page, calls = getattr(_render, "page", None), getattr(_render, "calls", None)
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        _render.page, _render.calls = page, calls
+        try:
+            return ctx.copy().run(fn, *args, **kwargs)
+        finally:
+            _render.page = None
+
+    return run
+
+
+def cache_lookup(cache, result):
+    REGISTRY.inc("app_cache_requests_total", cache=cache, result=result)
+
+
+def timed(func):
+    """Decorator recording the wrapped helper's wall time, per page."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            REGISTRY.observe("app_function_seconds", time.perf_counter() - start,
+                             page=current_page(), function=func.__name__)
+    return wrapper
+
+
+# ------------------------------------------------------------------
+# TEXTFILE EXPORT
+# ------------------------------------------------------------------
+class TextfileExporter:
+    """Rewrites the Prometheus textfile every `interval` seconds."""
+
+    def __init__(self, path, registry=REGISTRY, interval=EXPORT_INTERVAL):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.registry.to_prometheus())
+        os.replace(tmp, self.path)  # the collector never sees a half-written file
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                log.exception("Writing %s failed", self.path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_exporter() -> TextfileExporter:
+    cfg = st.secrets.get("metrics", {})
+    return TextfileExporter(
+        cfg.get("textfile", DEFAULT_TEXTFILE),
+        interval=float(cfg.get("export_interval", EXPORT_INTERVAL)),
+    )
@@ -0,0 +1,22 @@
+"""Sidebar navigation.
+
+Streamlit's automatic page list is switched off (`client.showSidebarNavigation`
+in .streamlit/config.toml) so the admin page stays unlisted; every public page
+draws this list instead.
+"""
+import streamlit as st
+
+PUBLIC_PAGES = [
+    ("Home.py", "Home", "🧵"),
+    ("pages/1_Profile.py", "Profile", "👤"),
+    ("pages/2_Workshop Registration.py", "Workshop Registration", "🧾"),
+    ("pages/3_My_Registration.py", "My Registrations", "📄"),
+    ("pages/4_Organizer_Dashboard.py", "Organizer Dashboard", "📈"),
+]
+
+
+def sidebar_nav():
+    """Link the public pages from the sidebar; call after `st.set_page_config`."""
+    with st.sidebar:
+        for path, label, icon in PUBLIC_PAGES:
+            st.page_link(path, label=label, icon=icon)
@@ -0,0 +1,115 @@
+"""Pooled HTTP session and local id_token verification for Google sign-in.
+Calls through the session are counted in `core.metrics`.
+"""
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import streamlit as st
+from google.auth import jwt
+from google.auth.exceptions import TransportError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.metrics import cache_lookup, external_call
+
+CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+ISSUERS = {"accounts.google.com", "https://accounts.google.com"}
+
+TIMEOUT = (3.05, 10)  # connect, read (seconds)
+CERTS_DEFAULT_MAX_AGE = 3600
+CLOCK_SKEW = 10  # seconds of tolerance on iat/exp
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+# what `verify_id_token` raises when Google's signing keys can't be fetched;
+# the token wasn't checked, so callers may fall back to the userinfo endpoint
+CERT_FETCH_ERRORS = (requests.RequestException, TransportError)
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout to every call."""
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", TIMEOUT)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            resp = super().request(method, url, *args, **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            external_call("oauth", _endpoint(url), status, time.perf_counter() - started)
+
+
+def _endpoint(url) -> str:
+    """"token", "userinfo", "certs" for Google APIs; "avatar" for profile pictures."""
+    parts = urlsplit(url)
+    if parts.netloc.endswith("googleapis.com"):
+        return parts.path.rstrip("/").rsplit("/", 1)[-1]
+    return "avatar"
+
+
+@st.cache_resource(show_spinner=False)
+def get_http() -> requests.Session:
+    session = TimeoutSession()
+    # GET is retried on 5xx; POST only on connection errors, since an auth
+    # code is single-use and a replayed exchange would fail anyway
+    retry = Retry(
+        total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504],
+        allowed_methods=frozenset({"GET"}),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+class GoogleCerts:
+    """Google's id_token signing certificates, cached per their Cache-Control."""
+
+    def __init__(self, url=CERTS_URL):
+        self.url = url
+        self._lock = threading.Lock()
+        self._certs = None
+        self._expires = 0.0
+
+    def get(self, force=False) -> dict:
+        with self._lock:
+            if force or self._certs is None or time.monotonic() >= self._expires:
+                cache_lookup("google_certs", "miss")
+                resp = get_http().get(self.url)
+                resp.raise_for_status()
+                m = _MAX_AGE.search(resp.headers.get("Cache-Control", ""))
+                max_age = int(m.group(1)) if m else CERTS_DEFAULT_MAX_AGE
+                self._certs = resp.json()
+                self._expires = time.monotonic() + max_age
+            else:
+                cache_lookup("google_certs", "hit")
+            return self._certs
+
+
+@st.cache_resource(show_spinner=False)
+def get_google_certs() -> GoogleCerts:
+    return GoogleCerts()
+
+
+def verify_id_token(token, client_id) -> dict:
+    """Verify a Google id_token locally and return its claims.
+
+    Raises ValueError if the token is malformed or its signature, audience,
+    issuer, expiry or email verification is wrong: a failed login. Raises
+    one of `CERT_FETCH_ERRORS` if the signing keys can't be fetched.
+    """
+    certs = get_google_certs()
+    keys = certs.get()
+    if jwt.decode_header(token).get("kid") not in keys:
+        # signed with a key Google rotated in after our copy was cached
+        keys = certs.get(force=True)
+    claims = jwt.decode(token, certs=keys, audience=client_id, clock_skew_in_seconds=CLOCK_SKEW)
+    if claims.get("iss") not in ISSUERS:
+        raise ValueError(f"Unexpected id_token issuer {claims.get('iss')!r}")
+    if not claims.get("email_verified", False):
+        raise ValueError("Google account email is not verified")
+    return claims
@@ -0,0 +1,190 @@
+"""Client-side Sheets quota enforcement with retries.
+
+Google meters the Sheets API per minute, separately for reads and writes.
+Every HTTP request gspread makes goes through `QuotaHTTPClient`, which takes
+a token from the matching bucket before sending and retries 429 replies
+with jittered exponential backoff. A 5xx may come after the request took
+effect, so it is retried only for calls that are safe to repeat; a
+`values.append` retried blindly could add the same rows twice. Interactive work (page renders, queued
+user writes) is served before background work (sync jobs, refreshers),
+which also has to leave a small reserve in the bucket untouched. Token
+waits and each request's latency are recorded in `core.metrics`.
+"""
+import collections
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from core.metrics import REGISTRY, external_call
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+READS_PER_MINUTE = 60   # per-user Sheets quota for a service account
+WRITES_PER_MINUTE = 60
+BURST_SHARE = 0.2       # part of the quota usable as an instant burst
+BACKGROUND_RESERVE = 2  # tokens background requests must leave for interactive ones
+WINDOW = 60.0           # seconds the per-minute quota is counted over
+
+QUOTA_STATUS = 429                        # rejected unprocessed: always safe to retry
+SERVER_ERRORS = {500, 502, 503, 504}      # may have been applied: retried if idempotent
+IDEMPOTENT_KINDS = {"values.batchUpdate", "values.update", "values.clear"}  # besides GETs
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0      # seconds
+BACKOFF_CAP = 32.0
+
+_priority = contextvars.ContextVar("sheets_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Run the enclosed Sheets calls at `level` (INTERACTIVE or BACKGROUND)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Per-minute rate limit with priority-ordered waiters.
+
+    Tokens refill at `per_minute` / 60 per second, up to a burst of
+    `capacity`. Burst on top of refill could exceed the quota in the first
+    minute, so the send times of the last 60 s are kept too and no window
+    holds more than `per_minute`: a saturated client runs at the quota
+    ceiling instead of tripping it.
+    """
+
+    def __init__(self, per_minute, burst_share=BURST_SHARE, reserve=BACKGROUND_RESERVE):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst_share)
+        self.rate = per_minute / WINDOW  # tokens per second
+        self.reserve = min(reserve, self.capacity - 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._sent = collections.deque()  # send times within the last WINDOW
+        self._waiting = [0, 0]
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        while self._sent and self._sent[0] <= now - WINDOW:
+            self._sent.popleft()
+
+    def _delay(self, level, now) -> float:
+        """Seconds until a `level` request may be sent (0 or less: now)."""
+        self._refill(now)
+        need = 1 + (self.reserve if level == BACKGROUND else 0)
+        delay = (need - self._tokens) / self.rate
+        if len(self._sent) >= self.per_minute:
+            delay = max(delay, self._sent[0] + WINDOW - now)
+        return delay
+
+    def _take(self, now):
+        self._tokens -= 1
+        self._sent.append(now)
+
+    def acquire(self, level=INTERACTIVE):
+        with self._cond:
+            self._waiting[level] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._delay(level, now)
+                    if delay <= 0 and not any(self._waiting[:level]):
+                        self._take(now)
+                        return
+                    self._cond.wait(max(delay, 0.01))
+            finally:
+                self._waiting[level] -= 1
+                self._cond.notify_all()
+
+
+class QuotaLimiter:
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE,
+                 max_retries=MAX_RETRIES, sleep=time.sleep):
+        self.reads = TokenBucket(reads_per_minute)
+        self.writes = TokenBucket(writes_per_minute)
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.retries = 0  # total retried requests, for instrumentation
+
+    def bucket(self, method) -> TokenBucket:
+        return self.reads if method.lower() == "get" else self.writes
+
+    @staticmethod
+    def backoff(attempt) -> float:
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class QuotaHTTPClient(HTTPClient):
+    """gspread HTTP client that rate-limits and retries every request."""
+
+    def __init__(self, auth, session=None, limiter=None):
+        super().__init__(auth, session)
+        self.limiter = limiter or QuotaLimiter()
+
+    def request(self, method, endpoint, *args, **kwargs):
+        bucket = self.limiter.bucket(method)
+        level = _priority.get()
+        kind = endpoint_kind(method, endpoint)
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            bucket.acquire(level)
+            started = time.perf_counter()
+            REGISTRY.observe("app_sheets_quota_wait_seconds", started - waited,
+                             bucket="write" if bucket is self.limiter.writes else "read")
+            try:
+                resp = super().request(method, endpoint, *args, **kwargs)
+                external_call("sheets", kind, resp.status_code, time.perf_counter() - started)
+                return resp
+            except APIError as e:
+                external_call("sheets", kind, e.code, time.perf_counter() - started)
+                if not retryable(method, kind, e.code) or attempt >= self.limiter.max_retries:
+                    raise
+                retry_after = e.response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else self.limiter.backoff(attempt)
+                self.limiter.retries += 1
+                attempt += 1
+                self.limiter.sleep(delay)
+
+    @classmethod
+    def factory(cls, limiter):
+        """Callable for gspread's `http_client=` argument bound to one limiter."""
+        def make(auth, session=None):
+            return cls(auth, session, limiter=limiter)
+        return make
+
+
+def retryable(method, kind, status) -> bool:
+    """Whether a failed call may be sent again: quota rejections always,
+    server errors only when repeating the call can't duplicate its effect."""
+    if status == QUOTA_STATUS:
+        return True
+    return status in SERVER_ERRORS and (method.upper() == "GET" or kind in IDEMPOTENT_KINDS)
+
+
+def endpoint_kind(method, url) -> str:
+    """Short name of a Sheets/Drive call, e.g. "values.append" or "metadata"."""
+    path = unquote(urlsplit(url).path)
+    if "/drive/" in path:
+        return "drive." + method.lower()
+    _, _, rest = path.partition("/v4/spreadsheets/")
+    sid, _, rest = rest.partition("/")
+    if not rest:
+        return sid.split(":", 1)[1] if ":" in sid else "metadata"
+    if rest.startswith("values:"):
+        return "values." + rest[len("values:"):]
+    for action in ("append", "clear"):
+        if rest.endswith(":" + action):
+            return "values." + action
+    return "values.get" if method.upper() == "GET" else "values.update"
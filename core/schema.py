@@ -0,0 +1,56 @@
+"""Sheet names and expected header rows."""
+
+USER_SHEET_NAME = "Billing_Users"  # case sensitive
+REG_SHEET_NAME = "Workshop_Registrations"
+
+USER_HEADERS = ["Email", "Name", "Picture"]
+# what a registration form or import supplies
+REG_FIELDS = [
+    "Name", "Email", "Contact", "ShirtNeeded",
+    "EquipmentChoice", "PendingAmount", "Timestamp",
+]
+# plus what storage assigns: a stable id and an edit counter for compare-and-set
+REG_ID = "RegID"
+REG_VERSION = "Version"
+REG_HEADERS = REG_FIELDS + [REG_ID, REG_VERSION]
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # as written by the registration pages
+
+SHIRT_CHOICES = ["Yes", "No"]
+EQUIP_CHOICES = ["Return", "Buy"]
+EQUIP_BUY_AMOUNT = 200  # ₹ pending when equipment is bought instead of returned
+
+HEADERS = {
+    USER_SHEET_NAME: USER_HEADERS,
+    REG_SHEET_NAME: REG_HEADERS,
+}
+
+
+def col_letter(col) -> str:
+    """1-based column number -> letter (A..Z is all these sheets need)."""
+    return chr(ord("A") + col - 1)
+
+
+def row_range(row_num, width) -> str:
+    """A1 range covering columns A.. of one sheet row, e.g. A5:G5."""
+    return f"A{row_num}:{col_letter(width)}{row_num}"
+
+
+def header_range(headers) -> str:
+    """A1 range covering the header row, e.g. A1:G1."""
+    return row_range(1, len(headers))
+
+
+def tail_range(start_row, headers) -> str:
+    """Open-ended A1 range from `start_row` down, e.g. A120:G."""
+    return f"A{start_row}:{col_letter(len(headers))}"
+
+
+def marker_col(headers) -> int:
+    """1-based column of the change-marker cell: row 1, one blank column
+    after the headers so it never joins the data table."""
+    return len(headers) + 2
+
+
+def marker_cell(headers) -> str:
+    return f"{col_letter(marker_col(headers))}1"
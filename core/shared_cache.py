@@ -0,0 +1,198 @@
+"""Host-wide tier under the worksheet snapshots, shared by server replicas.
+
+Each Streamlit server process keeps its own `SheetSnapshot`s. Run several
+replicas behind a load balancer and each one reads Google on its own
+schedule, so Sheets traffic grows with the replica count and the replicas
+disagree about recent writes. With `shared_cache` set under `[sheets]` in
+secrets, the replicas on a host share one SQLite file:
+
+    [sheets]
+    shared_cache = "/var/tmp/billing-snapshots.sqlite3"
+
+The file holds the raw sheet rows of every snapshot, each stamped with the
+`generation` that last wrote it. A replica remembers the generation its
+frame reflects and, on each check, pulls only the rows written since;
+nothing is reloaded while the generation stands still. Whenever the shared
+copy is older than the snapshot TTL, one replica takes a short lease and
+refreshes it from Sheets while the others wait for its result, so a TTL
+window costs one Sheets read per host however many replicas there are.
+Rows a replica writes to Sheets are published too, so the others see them
+on their next check instead of on the next Sheets read.
+"""
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+LEASE_SECONDS = 30    # a refresher that dies holding the lease is replaced after this
+CHECK_EVERY = 2.0     # seconds a replica trusts its frame before checking the generation
+LEADER_WAIT = 10.0    # seconds to wait for another replica's refresh before reading Sheets
+WAIT_STEP = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key        TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    base       INTEGER NOT NULL DEFAULT 0,   -- generation of the last full reload
+    marker     TEXT NOT NULL DEFAULT '',     -- the sheet's change-marker cell
+    fetched_at REAL NOT NULL DEFAULT 0,      -- wall clock of the last Sheets read
+    full_at    REAL NOT NULL DEFAULT 0       -- ... and of the last full one
+);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    key        TEXT NOT NULL,
+    row_num    INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    vals       TEXT NOT NULL,
+    PRIMARY KEY (key, row_num)
+);
+CREATE INDEX IF NOT EXISTS snapshot_rows_generation ON snapshot_rows(key, generation);
+CREATE TABLE IF NOT EXISTS leases (
+    key     TEXT PRIMARY KEY,
+    holder  TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class SharedState:
+    """What changed in one shared snapshot since a given generation."""
+
+    def __init__(self, generation, base, marker, fetched_at, full_at, rows):
+        self.generation = generation
+        self.base = base              # a reader older than this must reload everything
+        self.marker = marker
+        self.fetched_at = fetched_at
+        self.full_at = full_at
+        self.rows = rows              # [(row_num, values)], ascending
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class SharedCache:
+    """Generation-numbered sheet rows and refresher leases in one SQLite file."""
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; writers open their own BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _write(self):
+        """Transaction holding the write lock from the start, so read-then-write
+        sequences can't interleave across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- reads ---------------------------------------------------
+    def changes(self, key, since):
+        """`SharedState` with the rows written after generation `since`
+        (all rows if a full reload happened since then); None if `key` was
+        never published."""
+        conn = self._conn()
+        conn.execute("BEGIN")  # one consistent read of both tables
+        try:
+            meta = conn.execute(
+                "SELECT generation, base, marker, fetched_at, full_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+            if meta is None:
+                return None
+            generation, base, marker, fetched_at, full_at = meta
+            if since < base:
+                since = 0
+            rows = conn.execute(
+                "SELECT row_num, vals FROM snapshot_rows WHERE key = ? AND generation > ? ORDER BY row_num",
+                (key, since),
+            ).fetchall() if since < generation else []
+        finally:
+            conn.execute("COMMIT")
+        return SharedState(generation, base, marker, fetched_at, full_at,
+                           [(row_num, json.loads(vals)) for row_num, vals in rows])
+
+    # ---- writes --------------------------------------------------
+    def publish(self, key, rows, marker=None, reset=False, fetched=False) -> int:
+        """Store `rows` [(row_num, values)] under a new generation; returns
+        the current generation.
+
+        `reset` replaces every row (a full reload). `fetched` records that
+        the rows come from a Sheets read, which restarts the TTL for every
+        replica; the generation only moves if something actually changed.
+        """
+        now = time.time()
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO snapshots(key) VALUES (?)", (key,))
+            if rows or reset or marker is not None:
+                generation = self._bump(conn, key)
+            else:
+                generation = conn.execute("SELECT generation FROM snapshots WHERE key = ?", (key,)).fetchone()[0]
+            if reset:
+                conn.execute("DELETE FROM snapshot_rows WHERE key = ?", (key,))
+                conn.execute("UPDATE snapshots SET base = ?, full_at = ? WHERE key = ?", (generation, now, key))
+            if marker is not None:
+                conn.execute("UPDATE snapshots SET marker = ? WHERE key = ?", (marker, key))
+            if fetched:
+                conn.execute("UPDATE snapshots SET fetched_at = ? WHERE key = ?", (now, key))
+            conn.executemany(
+                "INSERT OR REPLACE INTO snapshot_rows(key, row_num, generation, vals) VALUES (?, ?, ?, ?)",
+                [(key, row_num, generation, json.dumps(values)) for row_num, values in rows],
+            )
+        return generation
+
+    @staticmethod
+    def _bump(conn, key) -> int:
+        conn.execute("UPDATE snapshots SET generation = generation + 1 WHERE key = ?", (key,))
+        return conn.execute("SELECT generation FROM snapshots WHERE key = ?", (key,)).fetchone()[0]
+
+    def expire(self, key, full=False):
+        """Make the next check of `key`, on any replica, refresh from Sheets."""
+        columns = "fetched_at = 0, full_at = 0" if full else "fetched_at = 0"
+        with self._write() as conn:
+            conn.execute(f"UPDATE snapshots SET {columns} WHERE key = ?", (key,))
+
+    # ---- refresher election --------------------------------------
+    def try_lead(self, key) -> bool:
+        """Take (or renew) the lease to refresh `key` from Sheets."""
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT holder, expires FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != self.holder and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases(key, holder, expires) VALUES (?, ?, ?)",
+                         (key, self.holder, now + self.lease_seconds))
+        return True
+
+    def release(self, key):
+        with self._write() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND holder = ?", (key, self.holder))
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache():
+    """The host's `SharedCache`, or None when `shared_cache` isn't configured."""
+    path = st.secrets.get("sheets", {}).get("shared_cache")
+    return SharedCache(path) if path else None
@@ -0,0 +1,252 @@
+"""Process-wide Google Sheets client and worksheet handle pool: one authorized
+client per server process, with opened spreadsheets and worksheets cached.
+"""
+import re
+import threading
+
+import gspread
+import streamlit as st
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+from core.quota import READS_PER_MINUTE, WRITES_PER_MINUTE, QuotaHTTPClient, QuotaLimiter
+from core.schema import HEADERS, header_range, marker_col
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+_RANGE_ROW = re.compile(r"![A-Z]+(\d+)")
+
+# 401 -> token revoked/expired mid-flight, 404 -> spreadsheet moved or deleted
+_STALE_CODES = {401, 404}
+# 400 on a write usually means the range no longer fits the sheet's layout
+_SCHEMA_CODES = {400}
+
+
+# ------------------------------------------------------------------
+# HANDLE POOL
+# ------------------------------------------------------------------
+class SheetsPool:
+    """One authorized, quota-limited client plus cached Spreadsheet/Worksheet handles."""
+
+    def __init__(self, service_account_info, limiter=None, session=None):
+        self._info = dict(service_account_info)
+        self.limiter = limiter or QuotaLimiter()
+        self._session = session  # pre-authorized session (e.g. an offline fake)
+        self._lock = threading.RLock()
+        self._creds = None
+        self._client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._headers_ok = set()
+
+    def client(self) -> gspread.Client:
+        with self._lock:
+            if self._session is not None:
+                if self._client is None:
+                    self._client = gspread.Client(
+                        None, session=self._session,
+                        http_client=QuotaHTTPClient.factory(self.limiter),
+                    )
+                return self._client
+            if self._client is None:
+                self._creds = service_account.Credentials.from_service_account_info(
+                    self._info, scopes=SCOPES
+                )
+                self._client = gspread.authorize(
+                    self._creds, http_client=QuotaHTTPClient.factory(self.limiter)
+                )
+            if not self._creds.valid:
+                # refresh up front so concurrent sessions don't all race a 401
+                self._creds.refresh(Request())
+            return self._client
+
+    # Opening is done outside the lock so different spreadsheets open in
+    # parallel; if two threads race on the same one, the first stored wins.
+    def spreadsheet(self, name) -> gspread.Spreadsheet:
+        with self._lock:
+            sh = self._spreadsheets.get(name)
+            client = self.client()
+        if sh is None:
+            sh = client.open(name)
+            with self._lock:
+                sh = self._spreadsheets.setdefault(name, sh)
+        return sh
+
+    def worksheet(self, name, title=None) -> gspread.Worksheet:
+        """Worksheet `title` of spreadsheet `name` (first sheet when title is None)."""
+        key = (name, title)
+        with self._lock:
+            ws = self._worksheets.get(key)
+        if ws is None:
+            sh = self.spreadsheet(name)
+            ws = sh.sheet1 if title is None else sh.worksheet(title)
+            with self._lock:
+                ws = self._worksheets.setdefault(key, ws)
+        return ws
+
+    def add_worksheet(self, name, title, cols, rows=1000) -> gspread.Worksheet:
+        """Create worksheet `title` in spreadsheet `name` (a new partition)."""
+        key = (name, title)
+        with self._lock:
+            ws = self._worksheets.get(key)
+            if ws is None:
+                sh = self.spreadsheet(name)
+                try:
+                    ws = sh.add_worksheet(title, rows=rows, cols=cols)
+                except gspread.exceptions.APIError:
+                    # another process may have created it first
+                    ws = sh.worksheet(title)
+                self._worksheets[key] = ws
+            return ws
+
+    def ensure_headers(self, name, headers, title=None):
+        """Check (and repair) the header row once per worksheet per process.
+
+        Only row 1 is fetched; the result is memoized until `forget_headers`
+        or `invalidate` says the layout may have changed.
+        """
+        key = (name, title)
+        if key in self._headers_ok:
+            return
+        with self._lock:
+            if key in self._headers_ok:
+                return
+            ws = PooledWorksheet(self, name, title)
+            rng = header_range(headers)
+            got = ws.get(rng)
+            row = ((got[0] if got else []) + [""] * len(headers))[: len(headers)]
+            if row != list(headers):
+                ws.update([list(headers)], rng)
+            self._headers_ok.add(key)
+
+    def headers_verified(self, name, title=None):
+        """Row 1 was read and matched as part of another request; skip the check."""
+        with self._lock:
+            self._headers_ok.add((name, title))
+
+    def forget_headers(self, name):
+        with self._lock:
+            self._headers_ok = {k for k in self._headers_ok if k[0] != name}
+
+    def invalidate(self, name=None, reset_client=False):
+        """Drop cached handles for `name` (or all of them)."""
+        with self._lock:
+            if name is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                self._headers_ok.clear()
+            else:
+                self._spreadsheets.pop(name, None)
+                for key in [k for k in self._worksheets if k[0] == name]:
+                    del self._worksheets[key]
+                self.forget_headers(name)
+            if reset_client:
+                self._client = None
+                self._creds = None
+
+    @staticmethod
+    def is_stale(err: gspread.exceptions.APIError) -> bool:
+        return getattr(err, "code", None) in _STALE_CODES
+
+    @staticmethod
+    def is_schema_error(err) -> bool:
+        return isinstance(err, gspread.exceptions.APIError) and err.code in _SCHEMA_CODES
+
+
+class PooledWorksheet:
+    """Worksheet proxy that re-resolves its handle once when Google says it is stale.
+
+    Attribute access is forwarded to the pooled handle, so callers use it
+    exactly like a gspread Worksheet.
+    """
+
+    def __init__(self, pool: SheetsPool, name, title=None):
+        self._pool = pool
+        self._name = name
+        self._title = title
+
+    def __getattr__(self, attr):
+        value = getattr(self._pool.worksheet(self._name, self._title), attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            try:
+                return value(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                if not self._pool.is_stale(e):
+                    raise
+                self._pool.invalidate(self._name, reset_client=e.code == 401)
+                fresh = self._pool.worksheet(self._name, self._title)
+                return getattr(fresh, attr)(*args, **kwargs)
+
+        return call
+
+
+# ------------------------------------------------------------------
+# PUBLIC HELPERS
+# ------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_pool() -> SheetsPool:
+    cfg = st.secrets.get("sheets", {})
+    limiter = QuotaLimiter(
+        reads_per_minute=int(cfg.get("reads_per_minute", READS_PER_MINUTE)),
+        writes_per_minute=int(cfg.get("writes_per_minute", WRITES_PER_MINUTE)),
+    )
+    return SheetsPool(st.secrets["gcp_service_account"], limiter)
+
+
+def get_sheet(name, title=None, check_headers=True, create=False) -> PooledWorksheet:
+    """Pooled worksheet handle with a validated header row.
+
+    A missing worksheet `title` raises `gspread.WorksheetNotFound`, unless
+    writers pass `create=True`: then it is created (with its header row), so
+    a new workshop's partition appears with its first write. Callers that
+    read row 1 anyway pass `check_headers=False` and report a match with
+    `headers_verified`. Stops the page if the sheet isn't shared with the
+    service account.
+    """
+    pool = get_pool()
+    try:
+        try:
+            pool.worksheet(name, title)
+        except gspread.WorksheetNotFound:
+            if not create or name not in HEADERS:
+                raise
+            pool.add_worksheet(name, title, cols=marker_col(HEADERS[name]))
+        if name in HEADERS and check_headers:
+            pool.ensure_headers(name, HEADERS[name], title)
+    except gspread.SpreadsheetNotFound:
+        st.error(
+            f"Google Sheet '{name}' not found or not shared with the service "
+            f"account:\n\n`{st.secrets['gcp_service_account']['client_email']}` (Editor)."
+        )
+        st.stop()
+    return PooledWorksheet(pool, name, title)
+
+
+def batch_get(name, ranges) -> list:
+    """Values of sheet-qualified A1 `ranges` of spreadsheet `name`, in one
+    values.batchGet; one list of rows per range.
+
+    Like `PooledWorksheet`, re-resolves the spreadsheet once if it went stale.
+    """
+    pool = get_pool()
+    try:
+        resp = pool.spreadsheet(name).values_batch_get(ranges)
+    except gspread.exceptions.APIError as e:
+        if not pool.is_stale(e):
+            raise
+        pool.invalidate(name, reset_client=e.code == 401)
+        resp = pool.spreadsheet(name).values_batch_get(ranges)
+    return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+
+
+def appended_row(response) -> int | None:
+    """First sheet row written by a values.append call, from its response."""
+    updated = (response or {}).get("updates", {}).get("updatedRange", "")
+    m = _RANGE_ROW.search(updated)
+    return int(m.group(1)) if m else None
@@ -0,0 +1,512 @@
+"""Read-through worksheet snapshots shared by every session in the process.
+
+One read per TTL window, refreshed by a delta read of the new rows; writers
+patch their own rows in, and `core.shared_cache` can share refreshes
+between replicas.
+"""
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import pandas as pd
+import streamlit as st
+from gspread.utils import absolute_range_name
+
+from core.frames import concat, memory_report, replace_row, typed
+from core.index import DuplicateIndex, EmailIndex, RegIdIndex, RegistrationStats, legacy_reg_id
+from core.metrics import cache_lookup, in_render
+from core.schema import HEADERS, REG_ID, col_letter, marker_cell, marker_col, tail_range
+from core.shared_cache import CHECK_EVERY, LEADER_WAIT, WAIT_STEP, get_shared_cache
+from core.sheets import batch_get, get_pool, get_sheet
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60          # seconds
+FULL_RELOAD_EVERY = 600   # seconds; catches edits made by hand in the sheet
+LOAD_WORKERS = 4          # spreadsheets `fetch_frames` reads at once
+
+# index name -> index class, built for every snapshot whose headers have its columns
+INDEXES = {
+    "email": EmailIndex,
+    "id": RegIdIndex,
+    "dedup": DuplicateIndex,
+    "stats": RegistrationStats,
+}
+
+
+class SheetSnapshot:
+    """Cached rows of one worksheet, indexed by 1-based sheet row number."""
+
+    def __init__(self, name, headers, ttl=DEFAULT_TTL, title=None, shared=None):
+        self.name = name
+        self.title = title  # worksheet within the spreadsheet; None = first sheet
+        self.headers = list(headers)
+        self.ttl = ttl
+        self._shared = shared        # SharedCache, or None for a process-local snapshot
+        self._generation = 0         # shared generation the frame reflects
+        self._leading = False        # holds the shared refresher lease
+        self._lock = threading.RLock()         # guards the cached state; never held over I/O
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._edits = 0                        # bumped by every change to the cached state
+        self._frame = None
+        self._indexes = {}
+        self._marker = ""
+        self._loaded_at = 0.0
+        self._full_at = 0.0
+        self.version = 0  # bumped whenever the cached rows change
+
+    # ---- reads ---------------------------------------------------
+    @contextlib.contextmanager
+    def _loaded(self):
+        """Hold the lock over a loaded frame, refreshing it first if stale."""
+        while True:
+            self._refresh_if_stale()
+            self._lock.acquire()
+            if self._frame is not None:
+                break
+            self._lock.release()  # dropped again since the refresh
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def frame(self) -> pd.DataFrame:
+        """Current rows; shared, so callers must not mutate it in place."""
+        with self._loaded():
+            return self._frame
+
+    def index(self, name):
+        with self._loaded():
+            return self._indexes[name]
+
+    def select(self, index_name, key) -> pd.DataFrame:
+        """Rows whose `index_name` key matches, as a copy of the frame slice."""
+        with self._loaded():
+            return self._frame.loc[self._indexes[index_name].rows(key)].copy()
+
+    def summary(self, index_name) -> dict:
+        """`summary()` of an aggregate index, taken under the snapshot lock."""
+        with self._loaded():
+            return self._indexes[index_name].summary()
+
+    def matches(self, row_num, expected: dict, values=None) -> bool:
+        """Whether row `row_num` holds `expected` ({column: value}): the cached
+        row, or with `values` the row as just read from the sheet, compared
+        the way the cache would hold it."""
+        if values is not None:
+            if not any(str(v).strip() for v in values):
+                return False  # nothing there (yet)
+            row = self._typed_row(row_num, self._record(values)).loc[row_num]
+        else:
+            with self._loaded():
+                if row_num not in self._frame.index:
+                    return False
+                row = self._frame.loc[row_num]
+        return all(str(row[column]) == str(value) for column, value in expected.items())
+
+    def memory_usage(self):
+        """Bytes per column of the cached frame, or None if nothing is loaded."""
+        with self._lock:
+            return None if self._frame is None else memory_report(self._frame)
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = None
+            self._indexes = {}
+            self._edits += 1
+            self._share_expiry(full=True)
+
+    def expire(self):
+        """Refresh on the next read; rows below the known ones come in with
+        the usual delta read rather than a full reload."""
+        with self._lock:
+            self._loaded_at = 0.0
+            self._edits += 1
+            self._share_expiry()
+
+    # ---- local write-back ----------------------------------------
+    # Each returns the snapshot version that includes the write, or None if
+    # it couldn't be patched in (the next read then fetches it instead).
+    def apply_append(self, row_num, values):
+        """Record a row we just appended at sheet row `row_num`."""
+        return self.apply_appends(row_num, [values])
+
+    def apply_appends(self, start, rows):
+        """Record consecutive rows we just appended, the first at sheet row `start`."""
+        with self._lock:
+            if self._frame is None:
+                return None
+            if start is None or start > self._next_row():
+                # someone else appended in between; the tail read picks up both
+                self.expire()
+                return None
+            if start < self._next_row():
+                if self._holds(start, rows):
+                    return self.version  # a tail refresh already read them in
+                self.invalidate()  # rows were removed by hand
+                return None
+            self._append_rows(start, rows)
+            self._share(list(enumerate(rows, start)))
+            return self.version
+
+    def apply_update(self, row_num, values):
+        """Record an in-place overwrite of sheet row `row_num`."""
+        with self._lock:
+            version = self._update(row_num, values)
+            if version is not None:
+                self._share([(row_num, values)])
+            return version
+
+    def apply_updates(self, marker, updates, previous=None) -> list:
+        """Record a batch of our own overwrites, [(row_num, values)], together
+        with the change marker written in the same request.
+
+        `previous` is the marker the sheet held just before the write. If it
+        isn't the one we know, another process rewrote rows we haven't seen:
+        our marker is not adopted, so the next refresh reloads fully.
+        """
+        with self._lock:
+            foreign = previous is not None and previous != self._marker
+            versions = [self._update(row_num, values) for row_num, values in updates]
+            if foreign:
+                self.expire()
+            else:
+                self._marker = marker
+            self._share([u for u, v in zip(updates, versions) if v is not None],
+                        marker=None if foreign else marker)
+            return versions
+
+    # ---- internals -----------------------------------------------
+    @property
+    def _cache(self) -> str:
+        return f"snapshot:{self.name}" if self.title is None else f"snapshot:{self.name}/{self.title}"
+
+    @property
+    def _key(self) -> str:
+        return f"{self.name}/{self.title or ''}"
+
+    def _fresh(self, now) -> bool:
+        ttl = min(self.ttl, CHECK_EVERY) if self._shared else self.ttl
+        return self._frame is not None and now - self._loaded_at <= ttl
+
+    def _wants_full(self, now) -> bool:
+        return self._frame is None or now - self._full_at > FULL_RELOAD_EVERY
+
+    def _refresh_if_stale(self):
+        # unlocked read: at worst a refresh that finds it fresh after all
+        if self._fresh(time.monotonic()):
+            cache_lookup(self._cache, "hit")
+            return
+        _refresh_group(self.name, [self])
+
+    def _sheet_title(self):
+        """The worksheet's actual title, or None if it doesn't exist yet (its
+        first write creates it)."""
+        try:
+            return get_sheet(self.name, self.title, check_headers=False).title
+        except gspread.WorksheetNotFound:
+            return None
+
+    def _ranges(self, title, full) -> list:
+        """Sheet-qualified ranges a refresh reads: the whole table, or the
+        marker cell plus the rows below the last one we know (`A{n+1}:G`)."""
+        if full:
+            ranges = [f"A1:{col_letter(marker_col(self.headers))}"]
+        else:
+            ranges = [marker_cell(self.headers), tail_range(self._next_row(), self.headers)]
+        return [absolute_range_name(title, r) for r in ranges]
+
+    def _ingest(self, full, values, now) -> bool:
+        """Apply what `_ranges(full)` fetched (None: no worksheet, so no rows);
+        False means reload fully."""
+        start = None if full else self._next_row()
+        missing = values is None
+        if missing:
+            full, values = True, [[]]
+        if full:
+            self._load(values[0], check_headers=not missing)
+            self._full_at = now
+        elif not self._apply_tail(*values):
+            return False
+        self._loaded_at = now
+        if self._leading:
+            if full:
+                self._share(list(enumerate(values[0][1:], 2)), marker=self._marker, reset=True, fetched=True)
+            else:
+                self._share(list(enumerate(values[1], start)), fetched=True)
+        return True
+
+    def _load(self, vals, check_headers=True):
+        width = len(self.headers)
+        if check_headers:
+            self._check_headers(vals)
+        self._marker = _marker_of(vals[0] if vals else [], self.headers)
+        rows = [(r + [""] * width)[:width] for r in vals[1:]]
+        self._frame = _with_legacy_ids(
+            typed(pd.DataFrame(rows, columns=self.headers, index=range(2, len(rows) + 2)))
+        )
+        self._indexes = {
+            name: cls.build(self._frame)
+            for name, cls in INDEXES.items()
+            if set(cls.columns) <= set(self.headers)
+        }
+        self.version += 1
+        self._edits += 1
+
+    def _check_headers(self, vals):
+        width = len(self.headers)
+        if vals and (vals[0] + [""] * width)[:width] == self.headers:
+            # the full read covers row 1, so it doubles as the header check
+            get_pool().headers_verified(self.name, self.title)
+        else:
+            # header edited since we validated it; repair before trusting rows
+            get_pool().forget_headers(self.name)
+            get_sheet(self.name, self.title)
+
+    def _apply_tail(self, marker, tail) -> bool:
+        """Append rows added since the last fetch; False if a row was rewritten."""
+        if (marker[0][0] if marker and marker[0] else "") != self._marker:
+            return False  # a row was rewritten in place somewhere
+        if tail:
+            self._append_rows(self._next_row(), tail)
+        return True
+
+    def _append_rows(self, start, rows):
+        records = [self._record(r) for r in rows]
+        added = _with_legacy_ids(
+            typed(pd.DataFrame(records, columns=self.headers, index=range(start, start + len(records))))
+        )
+        self._frame = concat(self._frame, added)
+        for i, record in enumerate(records):
+            for idx in self._indexes.values():
+                idx.on_append(start + i, record)
+        self.version += 1
+        self._edits += 1
+
+    def _update(self, row_num, values):
+        if self._frame is None:
+            return None
+        if row_num not in self._frame.index:
+            # a row appended elsewhere that we haven't read yet
+            self.expire()
+            return None
+        old = self._frame.loc[row_num].to_dict()
+        record = self._record(values)
+        row = self._typed_row(row_num, record)
+        self._frame = replace_row(self._frame, row_num, row)
+        for idx in self._indexes.values():
+            idx.on_update(row_num, old, record)
+        self.version += 1
+        self._edits += 1
+        return self.version
+
+    def _holds(self, start, rows) -> bool:
+        """Whether the frame has `rows` at sheet rows `start`.. already,
+        compared by RegID where the sheet has one."""
+        columns = [REG_ID] if REG_ID in self.headers else self.headers
+        for row_num, values in enumerate(rows, start):
+            if row_num not in self._frame.index:
+                return False
+            ours = self._typed_row(row_num, self._record(values)).loc[row_num]
+            cached = self._frame.loc[row_num]
+            if any(str(cached[c]) != str(ours[c]) for c in columns):
+                return False
+        return True
+
+    def _next_row(self) -> int:
+        return int(self._frame.index[-1]) + 1 if len(self._frame) else 2
+
+    def _typed_row(self, row_num, record) -> pd.DataFrame:
+        return _with_legacy_ids(typed(pd.DataFrame([record], columns=self.headers, index=[row_num])))
+
+    def _record(self, values) -> dict:
+        vals = ["" if v is None else str(v) for v in values]
+        return dict(zip(self.headers, (vals + [""] * len(self.headers))[: len(self.headers)]))
+
+    # ---- shared tier ---------------------------------------------
+    def _share(self, rows, marker=None, reset=False, fetched=False):
+        """Publish rows now in our frame, [(row_num, values)], to the other replicas."""
+        if self._shared is None:
+            return
+        try:
+            generation = self._shared.publish(self._key, rows, marker=marker, reset=reset, fetched=fetched)
+        except sqlite3.Error:
+            log.exception("Publishing %s to the shared cache failed", self._key)
+            return
+        if reset or generation <= self._generation + 1:
+            # nobody else published in between, so our frame is that generation
+            self._generation = generation
+
+    def _share_expiry(self, full=False):
+        if self._shared is None:
+            return
+        try:
+            self._shared.expire(self._key, full=full)
+        except sqlite3.Error:
+            log.exception("Expiring %s in the shared cache failed", self._key)
+
+    def _sync_shared(self, now) -> bool:
+        """Bring the frame up to date from the shared tier; False means read
+        Sheets (as the elected refresher if `_leading` is set)."""
+        deadline = now + LEADER_WAIT
+        try:
+            while True:
+                with self._lock:
+                    since = self._generation if self._frame is not None else 0
+                state = self._shared.changes(self._key, since)
+                # a key without a full reload (base 0) only holds stray local writes
+                if state is not None and state.base and state.age() <= self.ttl:
+                    with self._lock:
+                        self._follow(state, now)
+                    return True
+                if self._shared.try_lead(self._key):
+                    self._leading = True
+                    if state is not None and state.base:
+                        with self._lock:
+                            self._follow(state, now)  # so the Sheets delta starts from the shared rows
+                    return False
+                if time.monotonic() >= deadline:
+                    return False  # the refresher is stuck; read Sheets ourselves
+                time.sleep(WAIT_STEP)
+        except sqlite3.Error:
+            log.exception("Reading %s from the shared cache failed", self._key)
+            return False
+
+    def _follow(self, state, now):
+        """Apply a `SharedState` pulled from the shared tier."""
+        next_row = None if self._frame is None else self._next_row()
+        appended = [(row_num, values) for row_num, values in state.rows if next_row and row_num >= next_row]
+        if appended and appended[0][0] != next_row:
+            # rows in between were published under a generation we can't see; take everything
+            state, next_row = self._shared.changes(self._key, 0), None
+        if next_row is None or state.base > self._generation:
+            head = self.headers + [""] * (marker_col(self.headers) - len(self.headers))
+            head[marker_col(self.headers) - 1] = state.marker
+            self._load([head] + [values for _, values in state.rows])
+        else:
+            self._marker = state.marker
+            for row_num, values in state.rows:
+                if row_num < next_row:
+                    self._update(row_num, values)
+            if appended:
+                self._append_rows(next_row, [values for _, values in appended])
+        self._generation = state.generation
+        self._loaded_at = now
+        self._full_at = now - (time.time() - state.full_at)
+
+
+def _marker_of(first_row, headers) -> str:
+    """Change-marker value from a sheet's row 1."""
+    return (list(first_row) + [""] * marker_col(headers))[marker_col(headers) - 1]
+
+
+def _with_legacy_ids(frame) -> pd.DataFrame:
+    """Give rows written before registration ids their `legacy_reg_id`."""
+    if REG_ID in frame:
+        blank = frame[REG_ID].str.strip() == ""
+        if blank.any():
+            frame.loc[blank, REG_ID] = [legacy_reg_id(r) for r in frame.index[blank]]
+    return frame
+
+
+def _refresh_group(name, snapshots):
+    """Refresh the stale ones among `snapshots` (all of spreadsheet `name`)
+    with a single values.batchGet. A delta that finds rewritten rows is
+    retried as a full read. Snapshots the shared tier brings up to date
+    are left out of the read.
+
+    The read runs outside the snapshot locks, so readers of a fresh copy
+    and writers patching one never wait on Sheets; its result is swapped in
+    under the lock, or fetched again if the snapshot changed meanwhile.
+    """
+    snapshots = sorted(snapshots, key=lambda snap: snap.title or "")
+    with contextlib.ExitStack() as stack:
+        for snap in snapshots:
+            stack.enter_context(snap._refresh_lock)
+        stack.callback(_release_leases, snapshots)
+        now = time.monotonic()
+        todo = []
+        for snap in snapshots:
+            if snap._fresh(now):
+                continue  # refreshed while we waited for it
+            if snap._shared is not None and snap._sync_shared(now):
+                cache_lookup(snap._cache, "shared")
+                continue
+            todo.append((snap, snap._wants_full(now)))
+        while todo:
+            plans = []
+            for snap, full in todo:
+                title = snap._sheet_title()
+                with snap._lock:
+                    full = full or snap._frame is None
+                    ranges = None if title is None else snap._ranges(title, full)
+                    plans.append((snap, full, snap._edits, ranges))
+            wanted = [r for *_, ranges in plans for r in ranges or []]
+            values = batch_get(name, wanted) if wanted else []
+            todo, i = [], 0
+            for snap, full, edits, ranges in plans:
+                if ranges is None:
+                    got = None  # no worksheet yet
+                else:
+                    got, i = values[i:i + len(ranges)], i + len(ranges)
+                with snap._lock:
+                    if snap._edits != edits:
+                        # a write was patched in while we read; what we read may predate it
+                        todo.append((snap, full))
+                    elif snap._ingest(full, got, now):
+                        cache_lookup(snap._cache, "miss" if full else "delta")
+                    else:
+                        todo.append((snap, True))
+
+
+def _release_leases(snapshots):
+    for snap in snapshots:
+        if snap._leading:
+            snap._leading = False
+            try:
+                snap._shared.release(snap._key)
+            except sqlite3.Error:
+                log.exception("Releasing the %s refresh lease failed", snap._key)
+
+
+@st.cache_resource(show_spinner=False)
+def _loader() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="snapshot-load")
+
+
+def fetch_frames(snapshots) -> list:
+    """Frames of several snapshots, with every stale one refreshed in one go.
+
+    Stale snapshots of the same spreadsheet share one values.batchGet, and
+    different spreadsheets are fetched in parallel, so a page waits for its
+    slowest fetch rather than the sum of them.
+    """
+    now = time.monotonic()
+    groups = {}
+    for snap in snapshots:
+        if not snap._fresh(now):
+            groups.setdefault(snap.name, []).append(snap)
+    if len(groups) == 1:
+        _refresh_group(*next(iter(groups.items())))
+    elif groups:
+        futures = [_loader().submit(in_render(_refresh_group), name, group) for name, group in groups.items()]
+        for future in futures:
+            future.result()
+    refreshed = {snap for group in groups.values() for snap in group}
+    return [snap._frame if snap in refreshed and snap._frame is not None else snap.frame()
+            for snap in snapshots]
+
+
+def get_snapshot(name, title=None) -> SheetSnapshot:
+    """Snapshot of worksheet `title` of `name` (registrations: one per workshop)."""
+    # always pass both: cache_resource keys get_snapshot(n) and get_snapshot(n, None) apart
+    return _snapshot(name, title)
+
+
+@st.cache_resource(show_spinner=False)
+def _snapshot(name, title) -> SheetSnapshot:
+    return SheetSnapshot(name, HEADERS[name], title=title, shared=get_shared_cache())
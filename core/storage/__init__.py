@@ -0,0 +1,31 @@
+"""Pluggable persistence for users and registrations.
+
+Pick the backend under `[storage]` in `.streamlit/secrets.toml`:
+
+    [storage]
+    backend = "sqlite"            # or "sheets" (default)
+    path = "data/billing.sqlite3"
+    sync_interval = 60            # mirror SQLite to the sheets every N seconds
+"""
+import streamlit as st
+
+from core.storage.base import Storage
+from core.storage.sheets_backend import SheetsStorage
+from core.storage.sqlite_backend import DEFAULT_DB_PATH, SqliteStorage
+from core.storage.sync import start_background_sync
+
+__all__ = ["Storage", "SheetsStorage", "SqliteStorage", "get_storage"]
+
+
+@st.cache_resource(show_spinner=False)
+def get_storage() -> Storage:
+    cfg = st.secrets.get("storage", {})
+    backend = cfg.get("backend", "sheets")
+    if backend == "sheets":
+        return SheetsStorage()
+    if backend == "sqlite":
+        store = SqliteStorage(cfg.get("path", DEFAULT_DB_PATH))
+        if cfg.get("sync_interval"):
+            start_background_sync(store, float(cfg["sync_interval"]))
+        return store
+    raise ValueError(f"Unknown storage backend {backend!r} (expected 'sheets' or 'sqlite')")
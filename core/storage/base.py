@@ -0,0 +1,67 @@
+"""Storage interface shared by the Google Sheets and SQLite backends.
+
+Frames use the sheet header names as columns and a backend-specific row key
+as index (sheet row number for Sheets, primary key for SQLite). Pages refer
+to a registration by its RegID, which both backends keep stable. Writes
+return a `WriteTicket`; synchronous backends hand back one already resolved.
+"""
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+
+class Storage(ABC):
+    # ---- users ---------------------------------------------------
+    @abstractmethod
+    def load_users(self) -> pd.DataFrame: ...
+
+    @abstractmethod
+    def find_user(self, email) -> pd.DataFrame: ...
+
+    @abstractmethod
+    def user_exists(self, email) -> bool: ...
+
+    @abstractmethod
+    def save_user(self, email, name, picture=None):
+        """Insert or update the user's row; returns a WriteTicket."""
+
+    # ---- registrations -------------------------------------------
+    # Registrations are partitioned by workshop; `event_id` is a
+    # `core.workshops` id and every call touches only that partition.
+    @abstractmethod
+    def load_regs(self, event_id) -> pd.DataFrame: ...
+
+    @abstractmethod
+    def find_regs(self, event_id, email) -> pd.DataFrame: ...
+
+    @abstractmethod
+    def iter_regs(self, event_id, chunk_rows):
+        """The workshop's registrations as successive frames of at most `chunk_rows` rows."""
+
+    @abstractmethod
+    def append_reg(self, event_id, row):
+        """Append a registration (REG_FIELDS order; RegID and Version are
+        assigned); returns a WriteTicket whose `values` is the full row."""
+
+    @abstractmethod
+    def append_regs(self, event_id, rows) -> list:
+        """Append many registration rows in one batch; returns one WriteTicket per row."""
+
+    @abstractmethod
+    def update_reg(self, event_id, reg_id, version, row):
+        """Overwrite registration `reg_id` with `row` (REG_FIELDS order) if it
+        is still at `version`; returns a WriteTicket that fails with
+        `WriteConflict` when someone else saved it first."""
+
+    @abstractmethod
+    def reg_exists(self, event_id, name, email, contact, shirt_needed, equipment_choice) -> bool: ...
+
+    @abstractmethod
+    def reg_stats(self, event_id) -> dict:
+        """Organizer totals, shaped like `RegistrationStats.summary()`."""
+
+    # ---- page loads ----------------------------------------------
+    def load_frames(self, event_id) -> tuple:
+        """(users, the workshop's registrations), fetched together where the
+        backend can overlap the reads; later lookups then hit warm caches."""
+        return self.load_users(), self.load_regs(event_id)
@@ -0,0 +1,114 @@
+"""Google Sheets storage: shared snapshots for reads, the write queue for writes.
+
+Registration appends go through the local journal first when one is
+configured (`core.journal`).
+"""
+import logging
+
+import pandas as pd
+
+from core.index import DuplicateIndex, is_legacy_reg_id, new_reg_id, reg_key, with_reg_identity
+from core.journal import get_journal
+from core.schema import REG_FIELDS, REG_HEADERS, REG_ID, REG_SHEET_NAME, REG_VERSION, USER_SHEET_NAME
+from core.snapshot import fetch_frames, get_snapshot
+from core.storage.base import Storage
+from core.workshops import worksheet_for
+from core.writes import WriteTicket, get_write_queue
+
+# what has to match besides the position before a legacy row is overwritten
+LEGACY_IDENTITY = ("Name", "Email", "Contact")
+
+log = logging.getLogger(__name__)
+
+
+class SheetsStorage(Storage):
+    # ---- users ---------------------------------------------------
+    def load_users(self) -> pd.DataFrame:
+        return get_snapshot(USER_SHEET_NAME).frame()
+
+    def find_user(self, email) -> pd.DataFrame:
+        return get_snapshot(USER_SHEET_NAME).select("email", email)
+
+    def user_exists(self, email) -> bool:
+        return email in get_snapshot(USER_SHEET_NAME).index("email")
+
+    def save_user(self, email, name, picture=None):
+        rows = get_snapshot(USER_SHEET_NAME).index("email").rows(email)
+        row = [email, name, picture or ""]
+        if not rows:
+            return get_write_queue().append(USER_SHEET_NAME, row)
+        return get_write_queue().update(USER_SHEET_NAME, rows[0], row)
+
+    # ---- registrations -------------------------------------------
+    # one worksheet (and so one snapshot) per workshop
+    @staticmethod
+    def _regs(event_id):
+        return get_snapshot(REG_SHEET_NAME, worksheet_for(event_id))
+
+    def load_regs(self, event_id) -> pd.DataFrame:
+        return self._regs(event_id).frame()
+
+    def find_regs(self, event_id, email) -> pd.DataFrame:
+        return self._regs(event_id).select("email", email)
+
+    def iter_regs(self, event_id, chunk_rows):
+        # the snapshot already mirrors the sheet; slicing it costs no API reads
+        frame = self._regs(event_id).frame()
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+    def append_reg(self, event_id, row):
+        return self.append_regs(event_id, [row])[0]
+
+    def append_regs(self, event_id, rows) -> list:
+        rows = [with_reg_identity(row) for row in rows]
+        journal = get_journal()
+        if journal is not None:
+            keys = [row[REG_HEADERS.index(REG_ID)] for row in rows]
+            try:
+                return journal.append(REG_SHEET_NAME, worksheet_for(event_id), rows, keys)
+            except OSError:
+                log.exception("Journal write failed; sending registrations straight to the sheet")
+        return get_write_queue().append_many(REG_SHEET_NAME, rows, worksheet_for(event_id))
+
+    def update_reg(self, event_id, reg_id, version, row):
+        """One range write, located through the RegID index; a legacy row gets
+        a real id with its first edit.
+
+        A legacy id is only the row's position, which a row deleted by hand
+        above it shifts onto another registration, so for those the row must
+        also still hold the name, email and contact we have for it.
+        """
+        new_id = new_reg_id() if is_legacy_reg_id(reg_id) else reg_id
+        values = list(row)[:len(REG_FIELDS)] + [new_id, int(version) + 1]
+        snap = self._regs(event_id)
+        rows = snap.index("id").rows(reg_id)
+        if not rows:
+            ticket = WriteTicket(REG_SHEET_NAME, "update", values, title=worksheet_for(event_id))
+            ticket.resolve(error=KeyError(f"registration {reg_id} not found"))
+            return ticket
+        expect = {REG_ID: reg_id, REG_VERSION: int(version)}
+        if is_legacy_reg_id(reg_id):
+            current = snap.frame().loc[rows[0]]
+            expect.update((column, current[column]) for column in LEGACY_IDENTITY)
+        return get_write_queue().update(REG_SHEET_NAME, rows[0], values, worksheet_for(event_id), expect=expect)
+
+    def reg_exists(self, event_id, name, email, contact, shirt_needed, equipment_choice) -> bool:
+        """Exact duplicate check (case-insensitive, contact stripped): one hash
+        lookup, plus the journaled rows not yet in the sheet."""
+        key = reg_key(name, email, contact, shirt_needed, equipment_choice)
+        if key in self._regs(event_id).index("dedup"):
+            return True
+        journal = get_journal()
+        if journal is None:
+            return False
+        columns = [REG_HEADERS.index(c) for c in DuplicateIndex.columns]
+        return any(reg_key(*(row[i] for i in columns)) == key
+                   for row in journal.pending_rows(REG_SHEET_NAME, worksheet_for(event_id)))
+
+    def reg_stats(self, event_id) -> dict:
+        return self._regs(event_id).summary("stats")
+
+    # ---- page loads ----------------------------------------------
+    def load_frames(self, event_id) -> tuple:
+        return tuple(fetch_frames([get_snapshot(USER_SHEET_NAME), self._regs(event_id)]))
@@ -0,0 +1,311 @@
+"""Local SQLite storage: same frames and write tickets as the Sheets backend.
+
+Reads and writes run at local-disk latency; the sheet becomes an export kept
+current by `core.storage.sync`. Each thread gets its own connection and the
+database runs in WAL mode so page renders don't block on writers.
+"""
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from core.frames import typed
+from core.index import new_reg_id, normalize_email, reg_key, with_reg_identity
+from core.schema import REG_FIELDS, REG_HEADERS, REG_SHEET_NAME, USER_HEADERS, USER_SHEET_NAME
+from core.storage.base import Storage
+from core.workshops import legacy_workshop
+from core.writes import WriteConflict, WriteTicket
+
+DEFAULT_DB_PATH = "data/billing.sqlite3"
+
+# sheet header -> column, in sheet order
+USER_COLUMNS = dict(zip(USER_HEADERS, ["email", "name", "picture"]))
+REG_COLUMNS = dict(zip(REG_HEADERS, [
+    "name", "email", "contact", "shirt_needed",
+    "equipment_choice", "pending_amount", "timestamp",
+    "reg_id", "version",
+]))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id        INTEGER PRIMARY KEY,
+    email     TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE,
+    name      TEXT NOT NULL DEFAULT '',
+    picture   TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS registrations (
+    id               INTEGER PRIMARY KEY,
+    event_id         TEXT NOT NULL DEFAULT '',
+    name             TEXT NOT NULL DEFAULT '',
+    email            TEXT NOT NULL,
+    email_key        TEXT NOT NULL,
+    contact          TEXT NOT NULL DEFAULT '',
+    shirt_needed     TEXT NOT NULL DEFAULT '',
+    equipment_choice TEXT NOT NULL DEFAULT '',
+    pending_amount   INTEGER NOT NULL DEFAULT 0,
+    timestamp        TEXT NOT NULL DEFAULT '',
+    reg_id           TEXT NOT NULL DEFAULT '',
+    version          INTEGER NOT NULL DEFAULT 1,
+    dedup_key        TEXT NOT NULL
+);
+
+-- bumped on every write; the sync job compares it with what it last mirrored
+CREATE TABLE IF NOT EXISTS changes (
+    tbl           TEXT PRIMARY KEY,
+    version       INTEGER NOT NULL DEFAULT 0,
+    synced        INTEGER NOT NULL DEFAULT 0,
+    synced_rows   INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO changes(tbl) VALUES ('users'), ('registrations');
+"""
+
+# run after `_migrate`; lookups are always within one workshop
+PARTITION_INDEXES = """
+DROP INDEX IF EXISTS registrations_email;
+DROP INDEX IF EXISTS registrations_dedup;
+CREATE INDEX IF NOT EXISTS registrations_event_email ON registrations(event_id, email_key);
+CREATE INDEX IF NOT EXISTS registrations_event_dedup ON registrations(event_id, dedup_key);
+CREATE UNIQUE INDEX IF NOT EXISTS registrations_reg_id ON registrations(reg_id);
+"""
+
+
+# SQL twin of RegistrationStats' normalization of choice columns
+_CAPITALIZE = "upper(substr(trim({0}), 1, 1)) || lower(substr(trim({0}), 2))"
+
+
+def _dedup_key(*fields) -> str:
+    return "\x1f".join(reg_key(*fields))
+
+
+class SqliteStorage(Storage):
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._stats = {}  # event_id -> (registrations version, summary)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            conn.executescript(PARTITION_INDEXES)
+
+    @staticmethod
+    def _migrate(conn):
+        """Bring older databases up to the current schema.
+
+        Rows from before per-workshop partitions are filed under the workshop
+        that lived on the first sheet; rows from before registration ids get
+        a fresh id at version 1.
+        """
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(registrations)")}
+        if "event_id" not in columns:
+            conn.execute("ALTER TABLE registrations ADD COLUMN event_id TEXT NOT NULL DEFAULT ''")
+            conn.execute("UPDATE registrations SET event_id = ?", (legacy_workshop().id,))
+        if "reg_id" not in columns:
+            conn.execute("ALTER TABLE registrations ADD COLUMN reg_id TEXT NOT NULL DEFAULT ''")
+            conn.execute("ALTER TABLE registrations ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        missing = [row_id for (row_id,) in conn.execute("SELECT id FROM registrations WHERE reg_id = ''")]
+        conn.executemany("UPDATE registrations SET reg_id = ? WHERE id = ?",
+                         [(new_reg_id(), row_id) for row_id in missing])
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _select(columns: dict, sql) -> str:
+        return "SELECT id, " + ", ".join(f'{col} AS "{hdr}"' for hdr, col in columns.items()) + f" {sql}"
+
+    def _frame(self, columns: dict, sql, params=()) -> pd.DataFrame:
+        df = pd.read_sql_query(self._select(columns, sql), self._conn(), params=params, index_col="id")
+        df.index.name = None
+        return typed(df)
+
+    def _frames(self, columns: dict, sql, chunk_rows, params=()):
+        """Like `_frame`, but read `chunk_rows` rows at a time."""
+        for df in pd.read_sql_query(self._select(columns, sql), self._conn(), params=params,
+                                    index_col="id", chunksize=chunk_rows):
+            df.index.name = None
+            yield typed(df)
+
+    @staticmethod
+    def _bump(conn, table) -> int:
+        """Advance `table`'s change version; returns the new one."""
+        conn.execute("UPDATE changes SET version = version + 1 WHERE tbl = ?", (table,))
+        return conn.execute("SELECT version FROM changes WHERE tbl = ?", (table,)).fetchone()[0]
+
+    # ---- users ---------------------------------------------------
+    def load_users(self) -> pd.DataFrame:
+        return self._frame(USER_COLUMNS, "FROM users ORDER BY id")
+
+    def find_user(self, email) -> pd.DataFrame:
+        return self._frame(USER_COLUMNS, "FROM users WHERE email_key = ?", (normalize_email(email),))
+
+    def user_exists(self, email) -> bool:
+        cur = self._conn().execute(
+            "SELECT 1 FROM users WHERE email_key = ?", (normalize_email(email),)
+        )
+        return cur.fetchone() is not None
+
+    def save_user(self, email, name, picture=None):
+        row = [email, name, picture or ""]
+        ticket = WriteTicket(USER_SHEET_NAME, "append", row)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO users(email, email_key, name, picture) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(email_key) DO UPDATE SET name = excluded.name, picture = excluded.picture",
+                (email, normalize_email(email), name or "", picture or ""),
+            )
+            version = self._bump(conn, "users")
+            (row_id,) = conn.execute(
+                "SELECT id FROM users WHERE email_key = ?", (normalize_email(email),)
+            ).fetchone()
+        ticket.resolve(row_num=row_id, version=version)
+        return ticket
+
+    # ---- registrations -------------------------------------------
+    def load_regs(self, event_id) -> pd.DataFrame:
+        return self._frame(REG_COLUMNS, "FROM registrations WHERE event_id = ? ORDER BY id", (event_id,))
+
+    def find_regs(self, event_id, email) -> pd.DataFrame:
+        return self._frame(
+            REG_COLUMNS, "FROM registrations WHERE event_id = ? AND email_key = ? ORDER BY id",
+            (event_id, normalize_email(email)),
+        )
+
+    def iter_regs(self, event_id, chunk_rows):
+        return self._frames(REG_COLUMNS, "FROM registrations WHERE event_id = ? ORDER BY id",
+                            chunk_rows, (event_id,))
+
+    @staticmethod
+    def _reg_params(event_id, row) -> dict:
+        """Column values for a full (REG_HEADERS) row."""
+        rec = dict(zip(REG_COLUMNS.values(), row))
+        rec["event_id"] = event_id
+        rec["pending_amount"] = int(rec["pending_amount"] or 0)
+        rec["version"] = int(rec["version"])
+        rec["email_key"] = normalize_email(rec["email"])
+        rec["dedup_key"] = _dedup_key(*row[:5])
+        return rec
+
+    def append_reg(self, event_id, row):
+        return self.append_regs(event_id, [row])[0]
+
+    def append_regs(self, event_id, rows) -> list:
+        """All rows in one transaction."""
+        rows = [with_reg_identity(row) for row in rows]
+        tickets = [WriteTicket(REG_SHEET_NAME, "append", row) for row in rows]
+        ids = []
+        with self._conn() as conn:
+            for row in rows:
+                rec = self._reg_params(event_id, row)
+                cur = conn.execute(
+                    f"INSERT INTO registrations({', '.join(rec)}) VALUES ({', '.join('?' * len(rec))})",
+                    tuple(rec.values()),
+                )
+                ids.append(cur.lastrowid)
+            version = self._bump(conn, "registrations")
+        for ticket, row_id in zip(tickets, ids):
+            ticket.resolve(row_num=row_id, version=version)
+        return tickets
+
+    def update_reg(self, event_id, reg_id, version, row):
+        """Compare-and-set in one statement: the WHERE clause checks the version."""
+        values = list(row)[:len(REG_FIELDS)] + [reg_id, int(version) + 1]
+        ticket = WriteTicket(REG_SHEET_NAME, "update", values)
+        rec = self._reg_params(event_id, values)
+        assignments = ", ".join(f"{col} = ?" for col in rec)
+        with self._conn() as conn:
+            cur = conn.execute(
+                f"UPDATE registrations SET {assignments} WHERE reg_id = ? AND event_id = ? AND version = ?",
+                (*rec.values(), reg_id, event_id, int(version)),
+            )
+            if cur.rowcount:
+                changed = self._bump(conn, "registrations")
+            else:
+                exists = conn.execute(
+                    "SELECT 1 FROM registrations WHERE reg_id = ? AND event_id = ?", (reg_id, event_id)
+                ).fetchone()
+        if cur.rowcount:
+            ticket.resolve(version=changed)
+        elif exists:
+            ticket.resolve(error=WriteConflict("changed by someone else since it was loaded"))
+        else:
+            ticket.resolve(error=KeyError(f"registration {reg_id} not found"))
+        return ticket
+
+    def reg_exists(self, event_id, name, email, contact, shirt_needed, equipment_choice) -> bool:
+        cur = self._conn().execute(
+            "SELECT 1 FROM registrations WHERE event_id = ? AND dedup_key = ? LIMIT 1",
+            (event_id, _dedup_key(name, email, contact, shirt_needed, equipment_choice)),
+        )
+        return cur.fetchone() is not None
+
+    def reg_stats(self, event_id) -> dict:
+        """GROUP BY totals, recomputed only when the registrations version moves."""
+        conn = self._conn()
+        (version,) = conn.execute("SELECT version FROM changes WHERE tbl = 'registrations'").fetchone()
+        cached = self._stats.get(event_id)
+        if cached is not None and cached[0] == version:
+            return dict(cached[1])
+        registrations, attendees, pending = conn.execute(
+            "SELECT count(*), count(DISTINCT email_key), coalesce(sum(pending_amount), 0) "
+            "FROM registrations WHERE event_id = ?", (event_id,)
+        ).fetchone()
+
+        def grouped(expr):
+            return dict(conn.execute(
+                f"SELECT {expr} AS k, count(*) FROM registrations WHERE event_id = ? GROUP BY k", (event_id,)
+            ))
+
+        days = conn.execute(
+            "SELECT date(timestamp) AS d, count(*) FROM registrations "
+            "WHERE event_id = ? AND d IS NOT NULL GROUP BY d", (event_id,)
+        ).fetchall()
+        summary = {
+            "registrations": registrations,
+            "attendees": attendees,
+            "shirts": grouped(_CAPITALIZE.format("shirt_needed")),
+            "equipment": grouped(_CAPITALIZE.format("equipment_choice")),
+            "pending_total": pending,
+            "by_day": pd.Series(
+                {pd.Timestamp(d).date(): n for d, n in days}, dtype="int64"
+            ).sort_index(),
+        }
+        self._stats[event_id] = (version, summary)
+        return dict(summary)
+
+    # ---- sync support --------------------------------------------
+    def export_rows(self, table, event_id=None) -> list:
+        """Rows of `table` (registrations: of one workshop) as sheet-ordered string lists."""
+        columns = USER_COLUMNS if table == "users" else REG_COLUMNS
+        where, params = ("", ()) if event_id is None else ("WHERE event_id = ? ", (event_id,))
+        cur = self._conn().execute(
+            f"SELECT {', '.join(columns.values())} FROM {table} {where}ORDER BY id", params
+        )
+        return [["" if v is None else str(v) for v in r] for r in cur]
+
+    def sync_state(self, table) -> tuple:
+        """(version, synced version, synced row count) for `table`."""
+        return self._conn().execute(
+            "SELECT version, synced, synced_rows FROM changes WHERE tbl = ?", (table,)
+        ).fetchone()
+
+    def mark_synced(self, table, version, rows):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE changes SET synced = ?, synced_rows = ? WHERE tbl = ?", (version, rows, table)
+            )
+
+    def is_empty(self) -> bool:
+        cur = self._conn().execute(
+            "SELECT (SELECT count(*) FROM users) + (SELECT count(*) FROM registrations)"
+        )
+        return cur.fetchone()[0] == 0
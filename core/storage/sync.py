@@ -0,0 +1,119 @@
+"""Mirror the SQLite store to Google Sheets so the sheet stays a readable export.
+
+Run once or in a loop:
+
+    python -m core.storage.sync --once
+    python -m core.storage.sync --interval 60
+
+or let `get_storage()` start it as a background thread by setting
+`sync_interval` under `[storage]` in secrets.
+"""
+import argparse
+import logging
+import threading
+import time
+
+import gspread
+
+from core.quota import BACKGROUND, priority
+from core.schema import HEADERS, REG_SHEET_NAME, USER_SHEET_NAME, col_letter
+from core.sheets import get_sheet
+from core.storage.sqlite_backend import SqliteStorage
+from core.workshops import get_workshops, worksheet_for
+
+log = logging.getLogger(__name__)
+
+TABLES = {"users": USER_SHEET_NAME, "registrations": REG_SHEET_NAME}
+
+
+def _partitions(store: SqliteStorage, table) -> dict:
+    """Worksheet title -> rows: users in one sheet, registrations one per workshop."""
+    if table == "users":
+        return {None: store.export_rows(table)}
+    return {worksheet_for(event_id): store.export_rows(table, event_id) for event_id in get_workshops()}
+
+
+def mirror_to_sheets(store: SqliteStorage, force=False) -> dict:
+    """Rewrite each changed table into its sheet(s); returns rows written per table."""
+    written = {}
+    for table, sheet_name in TABLES.items():
+        version, synced, synced_rows = store.sync_state(table)
+        if version == synced and not force:
+            continue
+        headers = HEADERS[sheet_name]
+        total = 0
+        for title, rows in _partitions(store, table).items():
+            if not rows and not synced_rows:
+                continue  # don't create tabs for workshops nobody registered for
+            sheet = get_sheet(sheet_name, title, create=True)
+            sheet.update([headers] + rows, "A1")
+            # synced_rows is the table total, so it bounds every partition's old length
+            if synced_rows > len(rows):
+                sheet.batch_clear([f"A{len(rows) + 2}:{col_letter(len(headers))}{synced_rows + 1}"])
+            total += len(rows)
+        store.mark_synced(table, version, total)
+        written[table] = total
+    return written
+
+
+def seed_from_sheets(store: SqliteStorage):
+    """Load the current sheets into an empty database (one-off migration)."""
+    if not store.is_empty():
+        return
+    for vals in get_sheet(USER_SHEET_NAME).get_all_values()[1:]:
+        vals = (vals + ["", "", ""])[:3]
+        if vals[0]:
+            store.save_user(*vals)
+    for event_id in get_workshops():
+        try:
+            sheet = get_sheet(REG_SHEET_NAME, worksheet_for(event_id))
+        except gspread.WorksheetNotFound:
+            continue  # nobody registered for this workshop yet
+        width = len(HEADERS[REG_SHEET_NAME])
+        rows = [(vals + [""] * width)[:width] for vals in sheet.get_all_values()[1:]]
+        rows = [vals for vals in rows if vals[1]]
+        if rows:
+            store.append_regs(event_id, rows)
+
+
+def start_background_sync(store: SqliteStorage, interval) -> threading.Thread:
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                with priority(BACKGROUND):
+                    mirror_to_sheets(store)
+            except Exception:  # keep mirroring; the next pass retries
+                log.exception("sheet sync failed")
+
+    thread = threading.Thread(target=loop, name="sqlite-sheet-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import streamlit as st
+    from core.storage.sqlite_backend import DEFAULT_DB_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=st.secrets.get("storage", {}).get("path", DEFAULT_DB_PATH))
+    parser.add_argument("--interval", type=float, default=60.0)
+    parser.add_argument("--once", action="store_true", help="mirror once and exit")
+    parser.add_argument("--seed", action="store_true", help="import the sheets into an empty database first")
+    parser.add_argument("--force", action="store_true", help="rewrite sheets even if unchanged")
+    args = parser.parse_args()
+
+    store = SqliteStorage(args.db)
+    if args.seed:
+        seed_from_sheets(store)
+    while True:
+        with priority(BACKGROUND):
+            written = mirror_to_sheets(store, force=args.force)
+        print(f"synced: {written}")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
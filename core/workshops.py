@@ -0,0 +1,112 @@
+"""Workshop catalogue and the per-workshop registration partitions.
+
+Workshops are data (`workshops.toml` in the app directory), not page copy.
+Registrations are partitioned by workshop id: each workshop has its own
+worksheet in the registrations spreadsheet and its own `event_id` slice in
+SQLite, so a page only loads, indexes and totals the workshop it shows.
+"""
+import os
+import tomllib
+from datetime import date
+
+import streamlit as st
+
+WORKSHOPS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workshops.toml")
+
+
+class Workshop:
+    def __init__(self, id, title, date, venue, fee, fee_note="", worksheet=None, highlights=()):
+        self.id = id
+        self.title = title
+        self.date = date
+        self.venue = venue
+        self.fee = int(fee)
+        self.fee_note = fee_note
+        # None -> the workshop id; "" -> the first sheet (pre-partitioning data)
+        self.worksheet = id if worksheet is None else (worksheet or None)
+        self.highlights = list(highlights)
+
+    @property
+    def label(self) -> str:
+        return f"{self.title} · {self.date:%d %b %Y}"
+
+    def __repr__(self):
+        return f"Workshop({self.id!r})"
+
+
+def load_workshops(path=WORKSHOPS_FILE) -> dict:
+    """id -> Workshop, ordered by date. Raises ValueError for a bad file."""
+    with open(path, "rb") as f:
+        entries = tomllib.load(f).get("workshop", [])
+    workshops = {}
+    for entry in entries:
+        try:
+            ws = Workshop(**entry)
+        except TypeError as e:
+            raise ValueError(f"{path}: bad workshop entry {entry.get('id')!r}: {e}") from e
+        if not isinstance(ws.date, date):
+            raise ValueError(f"{path}: workshop {ws.id!r} needs a date like 2025-08-23")
+        if ws.id in workshops:
+            raise ValueError(f"{path}: duplicate workshop id {ws.id!r}")
+        workshops[ws.id] = ws
+    if not workshops:
+        raise ValueError(f"{path}: no [[workshop]] entries")
+    return dict(sorted(workshops.items(), key=lambda kv: kv[1].date))
+
+
+@st.cache_resource(show_spinner=False)
+def get_workshops() -> dict:
+    return load_workshops()
+
+
+def get_workshop(event_id) -> Workshop:
+    try:
+        return get_workshops()[event_id]
+    except KeyError:
+        raise KeyError(f"unknown workshop {event_id!r}") from None
+
+
+def upcoming(today=None) -> list:
+    today = today or date.today()
+    return [w for w in get_workshops().values() if w.date >= today]
+
+
+def default_workshop(today=None) -> Workshop:
+    """The next workshop still to come, else the most recent one."""
+    soon = upcoming(today)
+    return soon[0] if soon else list(get_workshops().values())[-1]
+
+
+def legacy_workshop() -> Workshop:
+    """The workshop kept on the first sheet: registrations from before partitioning."""
+    for w in get_workshops().values():
+        if w.worksheet is None:
+            return w
+    return default_workshop()
+
+
+def worksheet_for(event_id):
+    """Worksheet title holding `event_id`'s registrations (None = first sheet)."""
+    return get_workshop(event_id).worksheet
+
+
+# ------------------------------------------------------------------
+# PAGE HELPER
+# ------------------------------------------------------------------
+def select_workshop(label="Workshop") -> Workshop:
+    """Workshop picker shared by the registration pages.
+
+    The choice lives in `st.session_state.event_id`, so it carries across
+    pages; `?event=<id>` preselects one. With a single workshop no picker
+    is shown.
+    """
+    workshops = get_workshops()
+    ids = list(workshops)
+    current = st.session_state.get("event_id") or st.query_params.get("event")
+    if current not in workshops:
+        current = default_workshop().id
+    if len(ids) > 1:
+        current = st.selectbox(label, ids, index=ids.index(current),
+                               format_func=lambda i: workshops[i].label)
+    st.session_state.event_id = current
+    return workshops[current]
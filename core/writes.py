@@ -0,0 +1,281 @@
+"""Buffered, batched write pipeline for sheet appends and row updates.
+
+A background worker flushes pending writes as one `values.append` and one
+`values.batchUpdate` per worksheet; each write gets a ticket to wait on.
+"""
+import atexit
+import logging
+import threading
+import time
+
+import streamlit as st
+from gspread.utils import absolute_range_name
+
+from core.schema import HEADERS, header_range, marker_cell, row_range
+from core.sheets import appended_row, batch_get, get_pool, get_sheet
+from core.snapshot import get_snapshot
+
+FLUSH_INTERVAL = 0.5  # seconds a write may wait for company
+MAX_BATCH = 100       # flush immediately once this many writes are pending
+WRITE_WAIT = 5.0      # how long a page blocks on its own write before moving on
+ACK_WAIT = 1.0        # ... on a journaled write, which is already safe on disk
+
+log = logging.getLogger(__name__)
+
+
+class WriteConflict(Exception):
+    """A conditional update found its row changed since the caller read it."""
+
+
+class WriteTicket:
+    """Completion handle for one queued write.
+
+    On success `row_num` is where the row landed and `version` the cache
+    version that already contains it (None if it will arrive with the next
+    read instead). A `durable` ticket belongs to a write recorded in the
+    local journal (`core.journal`): it is retried until it lands, so it
+    never resolves with a transient error.
+    """
+
+    def __init__(self, sheet_name, kind, values, row_num=None, title=None, expect=None):
+        self.sheet_name = sheet_name
+        self.title = title  # worksheet; None = first sheet
+        self.kind = kind  # "append" | "update"
+        self.values = list(values)
+        self.row_num = row_num
+        self.expect = expect  # update only if the row still holds {column: value}
+        self.version = None
+        self.error = None
+        self.durable = False
+        self.queued_at = time.monotonic()
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Call `fn(ticket)` once resolved (right away if it already is)."""
+        with self._callbacks_lock:
+            if not self.done:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def resolve(self, row_num=None, error=None, version=None):
+        with self._callbacks_lock:
+            if row_num is not None:
+                self.row_num = row_num
+            self.version = version
+            self.error = error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                log.exception("Write ticket callback failed")
+
+
+class WriteQueue:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._worker = None
+
+    # ---- producers -----------------------------------------------
+    def append(self, sheet_name, values, title=None) -> WriteTicket:
+        return self._submit([WriteTicket(sheet_name, "append", values, title=title)])[0]
+
+    def append_many(self, sheet_name, rows, title=None) -> list:
+        """Queue several appends at once so they land in the same request."""
+        return self._submit([WriteTicket(sheet_name, "append", values, title=title) for values in rows])
+
+    def update(self, sheet_name, row_num, values, title=None, expect=None) -> WriteTicket:
+        """Overwrite `row_num`; with `expect`, only if the row still holds those
+        values when the batch is written (else the ticket fails with WriteConflict)."""
+        return self._submit([WriteTicket(sheet_name, "update", values, row_num, title, expect)])[0]
+
+    def _submit(self, tickets):
+        with self._cond:
+            self._pending.extend(tickets)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return tickets
+
+    # ---- worker --------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].queued_at + self.flush_interval
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception:
+                # flush fails its own tickets; this thread must outlive any one batch
+                log.exception("Write flush failed")
+
+    def flush(self):
+        """Write everything pending now; safe to call from any thread."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            by_sheet = {}
+            for t in batch:
+                by_sheet.setdefault((t.sheet_name, t.title), []).append(t)
+            for (sheet_name, title), tickets in by_sheet.items():
+                try:
+                    self._flush_updates(sheet_name, title, [t for t in tickets if t.kind == "update"])
+                    self._flush_appends(sheet_name, title, [t for t in tickets if t.kind == "append"])
+                except Exception as e:
+                    log.exception("Flushing writes to %s failed", sheet_name)
+                    for t in tickets:
+                        if not t.done:
+                            t.resolve(error=e)
+
+    @staticmethod
+    def _note_failure(sheet_name, err):
+        if get_pool().is_schema_error(err):
+            get_pool().forget_headers(sheet_name)  # re-check row 1 on next access
+
+    @staticmethod
+    def _check_expected(snap, tickets, current) -> list:
+        """Compare-and-set: fail conditional updates whose row no longer holds
+        the expected values; returns the tickets still to write.
+
+        Checked against `current` ({row_num: values}), the rows as read from
+        the sheet just before the write, not against the snapshot, which may
+        be up to a TTL behind another process's edit.
+        """
+        ok, claimed = [], set()
+        for t in tickets:
+            if t.expect is not None and (
+                t.row_num in claimed or not snap.matches(t.row_num, t.expect, current[t.row_num])
+            ):
+                t.resolve(error=WriteConflict("changed by someone else since it was loaded"))
+                continue
+            claimed.add(t.row_num)
+            ok.append(t)
+        if len(ok) < len(tickets):
+            # the caller reloads to retry; a full reload, since rows deleted by
+            # hand move the others without changing the marker or the tail
+            snap.invalidate()
+        return ok
+
+    @staticmethod
+    def _patch_snapshot(snap, apply, *args):
+        """Patch our own write into the snapshot. The write already landed, so
+        a failure here only costs the cached copy, which is dropped instead."""
+        try:
+            return apply(*args)
+        except Exception:
+            log.exception("Patching the %s snapshot failed; reloading it", snap.name)
+            snap.invalidate()
+            return None
+
+    def _flush_updates(self, sheet_name, title, tickets):
+        if not tickets:
+            return
+        headers = HEADERS[sheet_name]
+        snap = get_snapshot(sheet_name, title)
+        # new change marker in the same request, so other processes' delta
+        # refresh knows existing rows changed and reloads fully
+        marker = f"{time.time_ns():x}"
+        try:
+            sheet = get_sheet(sheet_name, title, create=True)
+            # one read before writing: the marker we overwrite, which tells
+            # whether another process rewrote rows first, and every row a
+            # conditional update depends on
+            checked = sorted({t.row_num for t in tickets if t.expect is not None})
+            ranges = [marker_cell(headers)] + [row_range(r, len(headers)) for r in checked]
+            seen = batch_get(sheet_name, [absolute_range_name(sheet.title, r) for r in ranges])
+            previous = seen[0][0][0] if seen[0] and seen[0][0] else ""
+            current = {r: rows[0] if rows else [] for r, rows in zip(checked, seen[1:])}
+            tickets = self._check_expected(snap, tickets, current)
+            if not tickets:
+                return
+            data = [
+                {"range": row_range(t.row_num, len(t.values)), "values": [t.values]}
+                for t in tickets
+            ]
+            data.append({"range": marker_cell(headers), "values": [[marker]]})
+            sheet.batch_update(data)
+        except Exception as e:
+            self._note_failure(sheet_name, e)
+            for t in tickets:
+                if not t.done:
+                    t.resolve(error=e)
+            return
+        versions = self._patch_snapshot(
+            snap, snap.apply_updates, marker, [(t.row_num, t.values) for t in tickets], previous
+        ) or [None] * len(tickets)
+        for t, version in zip(tickets, versions):
+            t.resolve(version=version)
+
+    def _flush_appends(self, sheet_name, title, tickets):
+        if not tickets:
+            return
+        try:
+            # anchor on the header row so the marker cell never skews table detection
+            resp = get_sheet(sheet_name, title, create=True).append_rows(
+                [t.values for t in tickets], table_range=header_range(HEADERS[sheet_name])
+            )
+        except Exception as e:
+            self._note_failure(sheet_name, e)
+            for t in tickets:
+                t.resolve(error=e)
+            return
+        start = appended_row(resp)
+        snap = get_snapshot(sheet_name, title)
+        version = self._patch_snapshot(snap, snap.apply_appends, start, [t.values for t in tickets])
+        for i, t in enumerate(tickets):
+            t.resolve(row_num=None if start is None else start + i, version=version)
+
+
+@st.cache_resource(show_spinner=False)
+def get_write_queue() -> WriteQueue:
+    queue = WriteQueue()
+    atexit.register(queue.flush)  # don't drop buffered writes on shutdown
+    return queue
+
+
+# ------------------------------------------------------------------
+# SESSION REPORTING
+# ------------------------------------------------------------------
+def track(ticket, label):
+    """Remember a write so a later render can report how it went."""
+    st.session_state.setdefault("pending_writes", []).append((label, ticket))
+
+
+def show_pending_writes():
+    """Report writes that finished since the last render; keep the rest."""
+    still_pending = []
+    for label, ticket in st.session_state.get("pending_writes", []):
+        if not ticket.done:
+            still_pending.append((label, ticket))
+        elif ticket.error:
+            st.error(f"{label} could not be saved: {ticket.error}")
+        else:
+            st.success(f"{label} saved.")
+    if any(ticket.durable for _, ticket in still_pending):
+        st.info(f"{len(still_pending)} change(s) received and queued; they will show here once "
+                "saved to the sheet.")
+    elif still_pending:
+        st.info(f"Saving {len(still_pending)} change(s)… refresh in a moment to confirm.")
+    st.session_state.pending_writes = still_pending
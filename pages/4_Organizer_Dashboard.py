@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from functools import partial
+
+from core.auth import is_organizer
+from core.bulk import IMPORT_COLUMNS, prepare, read_table
+from core.export import XLSX_MIME, roster_csv, roster_xlsx
+from core.metrics import render, timed
+from core.nav import sidebar_nav
+from core.storage import get_storage
+from core.workshops import select_workshop
+from core.writes import WRITE_WAIT, show_pending_writes, track
+
+# ------------------------------------------------------------------
+# CONFIG
+# ------------------------------------------------------------------
+st.set_page_config(page_title="Organizer Dashboard", page_icon="📈", layout="wide")
+sidebar_nav()
+
+# Figures come from totals kept on the shared snapshot, so a refresh is a
+# dict copy; at most one sheet read per snapshot TTL, however many
+# organizers have the page open.
+REFRESH_SECONDS = 30
+
+# ------------------------------------------------------------------
+# DATA ACCESS
+# ------------------------------------------------------------------
+@timed
+def load_stats(event_id) -> dict:
+    return get_storage().reg_stats(event_id)
+
+@timed
+def prepare_import(event_id, data: bytes, filename):
+    """(accepted, rejected) frames for an uploaded file; raises ValueError."""
+    return prepare(read_table(data, filename), partial(get_storage().reg_exists, event_id))
+
+@timed
+def import_registrations(event_id, accepted: pd.DataFrame) -> list:
+    """Append every accepted row in one batch; returns the write tickets."""
+    return get_storage().append_regs(event_id, accepted.astype(object).values.tolist())
+
+with render("dashboard"):
+    # ------------------------------------------------------------------
+    # ACCESS CHECK
+    # ------------------------------------------------------------------
+    if not st.session_state.get("logged_in"):
+        st.warning("Please log in from the Profile page first.")
+        st.stop()
+    if not is_organizer(st.session_state.user_email):
+        st.error("This page is only available to workshop organizers.")
+        st.stop()
+
+    # ------------------------------------------------------------------
+    # PAGE
+    # ------------------------------------------------------------------
+    st.title("📈 Organizer Dashboard")
+    show_pending_writes()
+    workshop = select_workshop()
+    event_id = workshop.id
+
+
+    @st.fragment(run_every=REFRESH_SECONDS)
+    @render("dashboard")
+    def live_figures(event_id):
+        stats = load_stats(event_id)
+        shirts = stats["shirts"]
+        equipment = stats["equipment"]
+
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Registrations", stats["registrations"])
+        c2.metric("Attendees", stats["attendees"], help="Distinct registered emails")
+        c3.metric("Shirts needed", shirts.get("Yes", 0))
+        c4.metric("Buy / Return", f"{equipment.get('Buy', 0)} / {equipment.get('Return', 0)}")
+        c5.metric("Pending ₹", f"{stats['pending_total']:,}")
+
+        by_day = stats["by_day"]
+        if by_day.empty:
+            st.info("No timestamped registrations yet.")
+        else:
+            by_day = by_day.set_axis(pd.to_datetime(by_day.index))
+            left, right = st.columns(2)
+            with left:
+                st.caption("Registrations per day")
+                st.bar_chart(by_day.rename("Registrations"))
+            with right:
+                st.caption("Cumulative registrations")
+                st.line_chart(by_day.cumsum().rename("Total"))
+
+        st.caption(f"Updated {datetime.now().strftime('%H:%M:%S')} · refreshes every {REFRESH_SECONDS}s")
+
+
+    live_figures(event_id)
+
+    # ------------------------------------------------------------------
+    # OFFLINE ROSTER
+    # ------------------------------------------------------------------
+    st.divider()
+    st.subheader("Offline roster")
+    st.caption(f"Every {workshop.title} registration with the user's profile name, generated when you click.")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M")
+    col_xlsx, col_csv = st.columns(2)
+    with col_xlsx:
+        st.download_button("⬇ Excel (.xlsx)", partial(roster_xlsx, event_id),
+                           file_name=f"roster-{event_id}-{stamp}.xlsx", mime=XLSX_MIME,
+                           on_click="ignore", use_container_width=True)
+    with col_csv:
+        st.download_button("⬇ CSV", partial(roster_csv, event_id),
+                           file_name=f"roster-{event_id}-{stamp}.csv", mime="text/csv",
+                           on_click="ignore", use_container_width=True)
+
+    # ------------------------------------------------------------------
+    # BULK IMPORT
+    # ------------------------------------------------------------------
+    st.divider()
+    st.subheader("Bulk import")
+    st.caption(f"XLSX or CSV with columns: {', '.join(IMPORT_COLUMNS)}, imported into {workshop.label}. "
+               "Invalid rows and duplicates are listed and skipped.")
+    upload = st.file_uploader("Registrations file", type=["xlsx", "csv"],
+                              key=f"bulk_import_{event_id}_{st.session_state.get('import_round', 0)}")
+    if upload is not None:
+        try:
+            accepted, rejected = prepare_import(event_id, upload.getvalue(), upload.name)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.write(f"**{len(accepted)}** row(s) ready to import, **{len(rejected)}** skipped.")
+            if not rejected.empty:
+                # +2: header line plus 1-based rows, as the organizer sees them in Excel
+                st.dataframe(rejected.set_axis(rejected.index + 2).rename_axis("Line"), use_container_width=True)
+            if not accepted.empty and st.button(f"Import {len(accepted)} registration(s)", type="primary"):
+                tickets = import_registrations(event_id, accepted)
+                last = tickets[-1]  # the batch is written in one request, so all finish together
+                if last.wait(WRITE_WAIT) and last.error:
+                    st.error(f"Import failed: {last.error}")
+                else:
+                    track(last, f"Import of {len(tickets)} registration(s)")
+                    st.session_state.import_round = st.session_state.get("import_round", 0) + 1  # clears the uploader
+                    st.rerun()
@@ -0,0 +1,143 @@
+import streamlit as st
+import pandas as pd
+
+from core.auth import is_admin
+from core.journal import get_journal
+from core.metrics import REGISTRY, get_exporter
+from core.schema import REG_SHEET_NAME, USER_SHEET_NAME
+from core.snapshot import get_snapshot
+from core.workshops import get_workshops
+
+# ------------------------------------------------------------------
+# CONFIG
+# ------------------------------------------------------------------
+st.set_page_config(page_title="Admin", page_icon="📊", layout="wide")
+
+# ------------------------------------------------------------------
+# ACCESS CHECK
+# ------------------------------------------------------------------
+# Left out of the sidebar (core.nav); anyone who finds the URL but is not a
+# listed admin gets a blank page.
+if not st.session_state.get("logged_in") or not is_admin(st.session_state.get("user_email")):
+    st.info("Nothing to see here.")
+    st.stop()
+
+# ------------------------------------------------------------------
+# HELPERS
+# ------------------------------------------------------------------
+def histogram_table(rows, keys, scale=1000.0) -> pd.DataFrame:
+    """One row per label set: count, mean and bucketed p50/p95 (ms by default)."""
+    records = []
+    for labels, h in rows:
+        rec = {k: labels.get(k, "") for k in keys}
+        rec.update({
+            "count": h.count,
+            "mean": round(h.sum / h.count * scale, 1) if h.count else 0.0,
+            "p50 ≤": h.quantile(0.5) * scale,
+            "p95 ≤": h.quantile(0.95) * scale,
+        })
+        records.append(rec)
+    if not records:
+        return pd.DataFrame(columns=list(keys) + ["count", "mean", "p50 ≤", "p95 ≤"])
+    return pd.DataFrame(records).sort_values(list(keys)).reset_index(drop=True)
+
+
+def counter_table(rows, index, columns) -> pd.DataFrame:
+    """Pivot a labelled counter into index × columns."""
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame([{**labels, "value": v} for labels, v in rows])
+    return df.pivot_table(index=index, columns=columns, values="value", aggfunc="sum", fill_value=0)
+
+
+counters, histograms = REGISTRY.snapshot()
+
+# ------------------------------------------------------------------
+# PAGE
+# ------------------------------------------------------------------
+st.title("📊 Hot-path metrics")
+st.caption("Since this server process started. Times in ms; p50/p95 are histogram bucket bounds.")
+
+st.subheader("Page renders")
+renders = histogram_table(histograms.get("app_page_render_seconds", []), ["page"])
+calls = histogram_table(histograms.get("app_page_external_calls", []), ["page"], scale=1.0)
+if not renders.empty and not calls.empty:
+    renders = renders.merge(
+        calls[["page", "mean", "p95 ≤"]].rename(columns={"mean": "calls/render", "p95 ≤": "calls p95 ≤"}),
+        on="page", how="left",
+    )
+st.dataframe(renders, hide_index=True, use_container_width=True)
+
+col_sheets, col_oauth = st.columns(2)
+with col_sheets:
+    st.subheader("Sheets API")
+    st.dataframe(histogram_table(histograms.get("app_sheets_request_seconds", []), ["endpoint"]),
+                 hide_index=True, use_container_width=True)
+    st.caption("Requests by page and status")
+    st.dataframe(counter_table(counters.get("app_sheets_requests_total", []), ["page", "endpoint"], "status"),
+                 use_container_width=True)
+    st.caption("Client-side quota waits")
+    st.dataframe(histogram_table(histograms.get("app_sheets_quota_wait_seconds", []), ["bucket"]),
+                 hide_index=True, use_container_width=True)
+with col_oauth:
+    st.subheader("Google OAuth")
+    st.dataframe(histogram_table(histograms.get("app_oauth_request_seconds", []), ["endpoint"]),
+                 hide_index=True, use_container_width=True)
+    st.caption("Requests by page and status")
+    st.dataframe(counter_table(counters.get("app_oauth_requests_total", []), ["page", "endpoint"], "status"),
+                 use_container_width=True)
+
+st.subheader("Caches")
+caches = counter_table(counters.get("app_cache_requests_total", []), "cache", "result")
+if not caches.empty:
+    hits = caches["hit"] if "hit" in caches else 0
+    caches["hit rate"] = (hits / caches.sum(axis=1)).round(3)
+st.dataframe(caches, use_container_width=True)
+
+journal = get_journal()
+if journal is not None:
+    st.subheader("Write journal")
+    status = journal.status()
+    col_pending, col_oldest, col_dead = st.columns(3)
+    col_pending.metric("Rows not yet in the sheet", status["pending"])
+    col_oldest.metric("Oldest (s)", status["oldest_seconds"] or 0)
+    col_dead.metric("Given up", status["dead"], help="Rows the sheet refused; kept in dead-letter.log")
+    caption = f"`{status['path']}`"
+    if status["last_error"]:
+        caption += f" · last error: {status['last_error']}"
+    st.caption(caption)
+
+st.subheader("Cached frames")
+partitions = {USER_SHEET_NAME: (USER_SHEET_NAME, None)}
+partitions.update({f"{REG_SHEET_NAME} · {w.id}": (REG_SHEET_NAME, w.worksheet) for w in get_workshops().values()})
+usage = {label: get_snapshot(*key).memory_usage() for label, key in partitions.items()}
+usage = {name: u for name, u in usage.items() if u is not None}
+if usage:
+    st.dataframe(
+        pd.DataFrame({name: (u / 1024).round(1) for name, u in usage.items()}).fillna(0).T
+          .assign(total_kb=lambda df: df.sum(axis=1)),
+        use_container_width=True,
+    )
+    st.caption("KiB per column (deep), including the row index.")
+else:
+    st.caption("No snapshot loaded in this process yet.")
+
+st.subheader("Data helpers")
+st.dataframe(histogram_table(histograms.get("app_function_seconds", []), ["page", "function"]),
+             hide_index=True, use_container_width=True)
+
+st.divider()
+exporter = get_exporter()
+col_a, col_b, col_c = st.columns(3)
+with col_a:
+    st.download_button("Download Prometheus text", REGISTRY.to_prometheus(),
+                       file_name="metrics.prom", mime="text/plain", use_container_width=True)
+with col_b:
+    if st.button("Write textfile now", use_container_width=True):
+        exporter.write()
+        st.toast(f"Wrote {exporter.path}")
+with col_c:
+    if st.button("Reset counters", use_container_width=True):
+        REGISTRY.reset()
+        st.rerun()
+st.caption(f"Textfile: `{exporter.path}` (rewritten every {exporter.interval:g}s)")
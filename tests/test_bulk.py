@@ -0,0 +1,102 @@
+"""Bulk import: reading the upload, column-wise validation and duplicate checks."""
+import io
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from core.bulk import IMPORT_COLUMNS, MAX_IMPORT_ROWS, prepare, read_table
+from core.schema import EQUIP_BUY_AMOUNT, REG_FIELDS
+from core.storage.sqlite_backend import SqliteStorage
+
+EVENT = "embroidery-2025-08"
+
+CSV = """ name ,EMAIL,Contact,Shirt Needed,equipmentchoice,Notes
+Asha,asha@example.com,98765 43210,yes,buy,walk-in
+Ravi,not-an-email,12,maybe,Return,
+"""
+
+
+def table(*rows) -> pd.DataFrame:
+    return pd.DataFrame([list(r) for r in rows], columns=IMPORT_COLUMNS)
+
+
+def never_registered(*key):
+    return False
+
+
+# ---- read_table --------------------------------------------------
+def test_csv_headers_are_matched_loosely_and_extra_columns_dropped():
+    df = read_table(CSV.encode("utf-8-sig"), "walkins.csv")
+    assert list(df.columns) == IMPORT_COLUMNS
+    assert df.iloc[0].tolist() == ["Asha", "asha@example.com", "98765 43210", "yes", "buy"]
+    assert df.iloc[1]["EquipmentChoice"] == "Return"
+
+
+def test_xlsx_upload_reads_like_csv():
+    buf = io.BytesIO()
+    read_table(CSV.encode(), "walkins.csv").to_excel(buf, index=False, engine="openpyxl")
+    df = read_table(buf.getvalue(), "walkins.XLSX")
+    assert df.equals(read_table(CSV.encode(), "walkins.csv"))
+
+
+def test_missing_columns_and_oversized_files_are_refused():
+    with pytest.raises(ValueError, match="Missing column.*Contact"):
+        read_table(b"Name,Email,ShirtNeeded,EquipmentChoice\n", "x.csv")
+    rows = "\n".join(["a,a@example.com,9876543210,Yes,Buy"] * (MAX_IMPORT_ROWS + 1))
+    with pytest.raises(ValueError, match="split the file"):
+        read_table((",".join(IMPORT_COLUMNS) + "\n" + rows).encode(), "x.csv")
+    with pytest.raises(ValueError, match="Could not read"):
+        read_table(b"not a workbook", "x.xlsx")
+
+
+# ---- prepare -----------------------------------------------------
+def test_each_invalid_field_is_reported_per_row():
+    accepted, rejected = prepare(table(
+        ["Asha", "asha@example.com", "(98765) 43-210", "yes", "BUY"],
+        ["", "bad", "12", "maybe", "Keep"],
+    ), never_registered)
+    assert list(accepted.columns) == REG_FIELDS
+    assert accepted.iloc[0][["ShirtNeeded", "EquipmentChoice", "PendingAmount"]].tolist() == [
+        "Yes", "Buy", EQUIP_BUY_AMOUNT]
+    assert rejected.loc[1, "Problem"] == (
+        "missing name; invalid email; invalid contact number; "
+        "ShirtNeeded must be Yes or No; EquipmentChoice must be Return or Buy"
+    )
+
+
+def test_repeated_row_in_the_file_is_rejected_after_normalizing():
+    accepted, rejected = prepare(table(
+        ["Asha", "asha@example.com", "9876543210", "Yes", "Return"],
+        ["ASHA", "Asha@Example.com", "9876543210", "yes", "return"],
+    ), never_registered)
+    assert list(accepted.index) == [0]
+    assert rejected.loc[1, "Problem"] == "duplicate of an earlier row in this file"
+    assert accepted.iloc[0]["PendingAmount"] == 0
+
+
+def test_rows_already_in_storage_are_rejected(tmp_path):
+    store = SqliteStorage(str(tmp_path / "billing.sqlite3"))
+    store.append_reg(EVENT, ["Asha", "asha@example.com", "9876543210", "Yes", "Return", 0,
+                             "2025-08-01 10:00:00"])
+    accepted, rejected = prepare(table(
+        ["asha", "ASHA@example.com", "9876543210", "Yes", "Return"],
+        ["Ravi", "ravi@example.com", "9876500000", "No", "Return"],
+    ), partial(store.reg_exists, EVENT))
+    assert list(accepted["Name"]) == ["Ravi"]
+    assert rejected.loc[0, "Problem"] == "already registered"
+
+
+def test_storage_is_only_asked_about_valid_first_occurrences():
+    asked = []
+
+    def reg_exists(*key):
+        asked.append(key)
+        return False
+
+    prepare(table(
+        ["Asha", "asha@example.com", "9876543210", "Yes", "Return"],
+        ["Asha", "asha@example.com", "9876543210", "Yes", "Return"],
+        ["Ravi", "bad", "9876500000", "No", "Return"],
+    ), reg_exists)
+    assert asked == [("asha", "asha@example.com", "9876543210", "yes", "return")]
@@ -0,0 +1,23 @@
+"""Indexes built from typed frames agree with keys taken from raw records."""
+import pandas as pd
+
+from core.frames import typed
+from core.index import DuplicateIndex, reg_key
+from core.schema import REG_HEADERS
+
+ROW = ["Ann", " Ann@X.com", "98", "", "", "0", "2025-08-01 10:00:00", "id1", "1"]
+
+
+def test_blank_categoricals_key_like_raw_records():
+    frame = typed(pd.DataFrame([ROW], columns=REG_HEADERS, index=[2]))
+    idx = DuplicateIndex.build(frame)
+    assert reg_key(*ROW[:5]) == ("ann", "ann@x.com", "98", "", "")
+    assert reg_key(*ROW[:5]) in idx
+
+
+def test_update_from_typed_row_drops_its_key():
+    frame = typed(pd.DataFrame([ROW], columns=REG_HEADERS, index=[2]))
+    idx = DuplicateIndex.build(frame)
+    new = dict(zip(REG_HEADERS, ROW), ShirtNeeded="Yes")
+    idx.on_update(2, frame.loc[2].to_dict(), new)
+    assert reg_key(*ROW[:5]) not in idx
@@ -0,0 +1,147 @@
+"""Crash recovery, replay dedup and dead-lettering of the write journal."""
+import json
+import os
+import time
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+
+import core.journal
+import core.snapshot
+import core.storage.sheets_backend
+from benchmarks.fake_sheets import FakeOAuthSession
+from benchmarks.run import install, seed_sheets
+from core.journal import DEAD_LETTER, GIVE_UP_AFTER, WriteJournal
+from core.storage.sheets_backend import SheetsStorage
+from core.writes import WriteTicket
+
+
+def api_error(status):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps({"error": {"code": status, "message": "refused", "status": "X"}}).encode()
+    return APIError(resp)
+
+
+class FakeQueue:
+    """Write queue stand-in; `outcome(values)` -> error or None settles each
+    row at once, else tickets stay open until the test resolves them."""
+
+    def __init__(self, outcome=None):
+        self.outcome = outcome
+        self.sent = []
+
+    def append_many(self, sheet_name, rows, title=None):
+        tickets = [WriteTicket(sheet_name, "append", values, title=title) for values in rows]
+        self.sent.extend(tickets)
+        if self.outcome is not None:
+            for t in tickets:
+                error = self.outcome(t.values)
+                t.resolve(error=error, row_num=None if error else 99)
+        return tickets
+
+
+class FakeSnapshot:
+    """The sheet as the replayer sees it: RegID -> row number."""
+
+    version = 1
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def expire(self):
+        pass
+
+    def index(self, name):
+        return self
+
+    def rows(self, key):
+        return [self.ids[key]] if key in self.ids else []
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    ids = {}
+    monkeypatch.setattr(core.journal, "get_snapshot", lambda name, title: FakeSnapshot(ids))
+    return ids
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_restart_replays_only_rows_missing_from_the_sheet(tmp_path, sheet):
+    first = WriteJournal(str(tmp_path), queue=FakeQueue(), replay_interval=3600)
+    tickets = first.append("Regs", "t", [["a"], ["b"]], ["id-a", "id-b"])
+    assert all(t.durable and not t.done for t in tickets)
+    first._file.close()  # the process dies before Google acknowledges
+
+    sheet["id-a"] = 7  # ... though the first row did land
+    queue = FakeQueue()
+    second = WriteJournal(str(tmp_path), queue=queue, replay_interval=3600)
+    assert second.path == first.path
+    wait_for(lambda: queue.sent)
+    assert [t.values for t in queue.sent] == [["b"]]
+    assert second.status()["pending"] == 1
+
+    queue.sent[0].resolve(row_num=8)
+    assert second.status()["pending"] == 0
+    second._file.close()
+    third = WriteJournal(str(tmp_path), queue=FakeQueue(), replay_interval=3600)
+    assert third.status()["pending"] == 0
+
+
+def test_torn_last_line_is_ignored(tmp_path, sheet):
+    first = WriteJournal(str(tmp_path), queue=FakeQueue(), replay_interval=3600)
+    first.append("Regs", "t", [["a"]], ["id-a"])
+    first._file.write(b'{"op": "append", "key": "id-b", "she')
+    first._file.close()
+    queue = FakeQueue()
+    second = WriteJournal(str(tmp_path), queue=queue, replay_interval=3600)
+    wait_for(lambda: queue.sent)
+    assert [t.values for t in queue.sent] == [["a"]]
+    assert second.status()["pending"] == 1
+
+
+def test_refused_row_is_given_up_without_blocking_the_rest(tmp_path, sheet):
+    queue = FakeQueue(lambda values: api_error(400) if values == ["bad"] else None)
+    journal = WriteJournal(str(tmp_path), queue=queue, replay_interval=0.01)
+    (bad,) = journal.append("Regs", "t", [["bad"]], ["id-bad"])
+    wait_for(lambda: bad.done)
+    assert isinstance(bad.error, APIError)
+    assert len(queue.sent) == GIVE_UP_AFTER
+    assert journal.status()["dead"] == 1 and journal.status()["pending"] == 0
+    with open(os.path.join(str(tmp_path), DEAD_LETTER)) as f:
+        (dead,) = [json.loads(line) for line in f]
+    assert dead["key"] == "id-bad" and dead["values"] == ["bad"] and "400" in dead["error"]
+
+    (good,) = journal.append("Regs", "t", [["good"]], ["id-good"])
+    assert good.done and good.error is None
+
+
+def test_transient_errors_are_retried(tmp_path, sheet):
+    failures = [api_error(503)] * (GIVE_UP_AFTER + 1)
+    queue = FakeQueue(lambda values: failures.pop() if failures else None)
+    journal = WriteJournal(str(tmp_path), queue=queue, replay_interval=0.001)
+    (ticket,) = journal.append("Regs", "t", [["row"]], ["id-row"])
+    wait_for(lambda: ticket.done)
+    assert ticket.error is None
+    assert journal.status()["dead"] == 0
+
+
+def test_journaled_rows_count_as_duplicates_before_they_land(tmp_path, monkeypatch):
+    session = seed_sheets(4)
+    install(session, FakeOAuthSession("user1@example.com", "User 1"))
+    monkeypatch.setattr(core.snapshot, "get_shared_cache", lambda: None)
+    journal = WriteJournal(str(tmp_path), queue=FakeQueue(), replay_interval=3600)  # Sheets is down
+    monkeypatch.setattr(core.storage.sheets_backend, "get_journal", lambda: journal)
+
+    storage = SheetsStorage()
+    reg = ["New Person", "new@x.com", "9000000001", "No", "Return"]
+    assert not storage.reg_exists("embroidery-2025-08", *reg)
+    storage.append_reg("embroidery-2025-08", reg + ["0", "2025-08-01 10:00:00"])
+    assert storage.reg_exists("embroidery-2025-08", "new person ", "NEW@x.com", " 9000000001", "no", "return")
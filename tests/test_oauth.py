@@ -0,0 +1,98 @@
+"""Local id_token verification: when it refetches keys, and which errors
+the login page may fall back on."""
+import json
+import time
+
+import pytest
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+import core.oauth
+from core.oauth import CERT_FETCH_ERRORS, GoogleCerts, verify_id_token
+
+CLIENT_ID = "client-id"
+
+
+def rsa_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    public = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                           serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private, public
+
+
+PRIVATE, PUBLIC = rsa_key()
+
+
+def id_token(kid="k1", **claims):
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "iat": now, "exp": now + 300,
+               "email": "a@x.com", "email_verified": True}
+    payload.update(claims)
+    return jwt.encode(crypt.RSASigner.from_string(PRIVATE, key_id=kid), payload).decode()
+
+
+class CertsSession:
+    """Google's certs endpoint; `certs` is served as is, `status` fails it."""
+
+    def __init__(self, certs=None, status=None):
+        self.certs = certs
+        self.status = status
+        self.fetches = 0
+
+    def get(self, url, **kwargs):
+        self.fetches += 1
+        if self.status is None and self.certs is None:
+            raise requests.ConnectionError("connection refused")
+        resp = requests.Response()
+        resp.status_code = self.status or 200
+        resp.url = url
+        resp.headers["Cache-Control"] = "public, max-age=3600"
+        resp._content = json.dumps(self.certs or {}).encode()
+        return resp
+
+
+@pytest.fixture
+def google(monkeypatch):
+    session = CertsSession({"k1": PUBLIC})
+    certs = GoogleCerts()
+    monkeypatch.setattr(core.oauth, "get_http", lambda: session)
+    monkeypatch.setattr(core.oauth, "get_google_certs", lambda: certs)
+    return session
+
+
+def test_valid_token_uses_cached_keys(google):
+    assert verify_id_token(id_token(), CLIENT_ID)["email"] == "a@x.com"
+    assert verify_id_token(id_token(), CLIENT_ID)["email"] == "a@x.com"
+    assert google.fetches == 1
+
+
+@pytest.mark.parametrize("claims", [
+    {"exp": int(time.time()) - 3600},
+    {"aud": "someone-else"},
+    {"iss": "https://evil.example.com"},
+    {"email_verified": False},
+])
+def test_bad_token_is_a_value_error_without_refetching_keys(google, claims):
+    verify_id_token(id_token(), CLIENT_ID)
+    with pytest.raises(ValueError):
+        verify_id_token(id_token(**claims), CLIENT_ID)
+    assert google.fetches == 1
+
+
+def test_unknown_key_id_refetches_once(google):
+    verify_id_token(id_token(), CLIENT_ID)
+    google.certs = {"k2": PUBLIC}  # Google rotated keys
+    assert verify_id_token(id_token(kid="k2"), CLIENT_ID)["email"] == "a@x.com"
+    assert google.fetches == 2
+
+
+@pytest.mark.parametrize("status", [None, 503])
+def test_unreachable_signing_keys_raise_a_fetch_error(monkeypatch, status):
+    monkeypatch.setattr(core.oauth, "get_http", lambda: CertsSession(status=status))
+    monkeypatch.setattr(core.oauth, "get_google_certs", GoogleCerts)
+    with pytest.raises(CERT_FETCH_ERRORS):
+        verify_id_token(id_token(), CLIENT_ID)
@@ -0,0 +1,86 @@
+"""Token bucket throughput and the retry policy of `QuotaHTTPClient`."""
+import gspread
+import pytest
+from gspread.exceptions import APIError
+
+from benchmarks.fake_sheets import FakeSheetsSession
+from core.quota import INTERACTIVE, WINDOW, QuotaHTTPClient, QuotaLimiter, TokenBucket
+
+
+def saturate(bucket, seconds):
+    """Send as fast as `bucket` allows on a simulated clock; returns send times."""
+    now, sent = bucket._updated, []
+    end = now + seconds
+    while True:
+        delay = bucket._delay(INTERACTIVE, now)
+        if delay > 0:
+            now += delay
+            continue
+        if now >= end:
+            return sent
+        bucket._take(now)
+        sent.append(now)
+
+
+def test_bucket_runs_at_the_quota():
+    bucket = TokenBucket(60)
+    start = bucket._updated
+    sent = saturate(bucket, 10 * WINDOW)
+    # no 60 s window over the quota, and no minute after the first under it
+    for i, t in enumerate(sent):
+        assert sum(1 for u in sent[i:] if u < t + WINDOW) <= 60
+    assert 60 * 9 <= sum(1 for t in sent if t >= start + WINDOW) <= 60 * 9 + 1
+
+
+def test_bucket_bursts_then_refills():
+    bucket = TokenBucket(60)
+    start = bucket._updated
+    sent = saturate(bucket, 5.5)
+    assert sum(1 for t in sent if t == start) == bucket.capacity
+    assert len(sent) == bucket.capacity + 5  # then one per second
+
+
+# ---- retries -----------------------------------------------------
+@pytest.fixture
+def sheets():
+    session = FakeSheetsSession()
+    session.add_spreadsheet("Book", [["A", "B"], ["1", "2"]])
+    sleeps = []
+    limiter = QuotaLimiter(10**6, 10**6, max_retries=3, sleep=sleeps.append)
+    client = gspread.Client(None, session=session, http_client=QuotaHTTPClient.factory(limiter))
+    sheet = client.open("Book").sheet1
+    session.reset_calls()
+    return session, sheet, limiter, sleeps
+
+
+def test_rate_limited_read_is_retried_with_backoff(sheets):
+    session, sheet, limiter, sleeps = sheets
+    session.fail_with(429, times=2)
+    assert sheet.get("A2:B2") == [["1", "2"]]
+    assert limiter.retries == 2 and len(sleeps) == 2
+    assert [c["status"] for c in session.calls] == [429, 429, 200]
+
+
+def test_retries_give_up_after_max_retries(sheets):
+    session, sheet, limiter, _ = sheets
+    session.fail_with(429, times=10)
+    with pytest.raises(APIError):
+        sheet.get("A2:B2")
+    assert len(session.calls) == limiter.max_retries + 1
+
+
+def test_server_error_on_append_is_not_retried(sheets):
+    session, sheet, limiter, _ = sheets
+    session.fail_with(503)  # the fake applies the append, then fails the reply
+    with pytest.raises(APIError):
+        sheet.append_rows([["3", "4"]])
+    assert session.values("Book") == [["A", "B"], ["1", "2"], ["3", "4"]]
+    assert limiter.retries == 0
+
+
+def test_server_error_on_batch_update_is_retried(sheets):
+    session, sheet, limiter, _ = sheets
+    session.fail_with(503)
+    sheet.batch_update([{"range": "A2:B2", "values": [["5", "6"]]}])
+    assert session.values("Book")[1] == ["5", "6"]
+    assert limiter.retries == 1
@@ -0,0 +1,58 @@
+"""Generations and refresher leases of the host-wide snapshot tier."""
+import time
+
+import pytest
+
+from core.shared_cache import SharedCache
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    a, b = SharedCache(path, lease_seconds=30), SharedCache(path, lease_seconds=30)
+    a.holder, b.holder = "host:1", "host:2"
+    return a, b
+
+
+def test_one_replica_leads_until_it_releases(replicas):
+    a, b = replicas
+    assert a.try_lead("k")
+    assert a.try_lead("k")  # renewing its own lease
+    assert not b.try_lead("k")
+    a.release("k")
+    assert b.try_lead("k")
+
+
+def test_lease_of_a_dead_leader_expires(replicas):
+    a, b = replicas
+    a.lease_seconds = 0.05
+    assert a.try_lead("k")
+    time.sleep(0.1)
+    assert b.try_lead("k")
+    assert not a.try_lead("k")
+
+
+def test_changes_since_a_generation(replicas):
+    a, b = replicas
+    assert b.changes("k", 0) is None
+    first = a.publish("k", [(2, ["x"]), (3, ["y"])], marker="m1", reset=True, fetched=True)
+    second = a.publish("k", [(3, ["y2"])])
+    assert second == first + 1
+
+    state = b.changes("k", first)
+    assert state.rows == [(3, ["y2"])] and state.marker == "m1"
+    assert b.changes("k", second).rows == []
+    assert a.publish("k", [], fetched=True) == second  # nothing new: same generation
+
+    third = a.publish("k", [(2, ["z"])], reset=True)
+    assert b.changes("k", second).rows == [(2, ["z"])]  # older than the reload: everything
+    assert b.changes("k", third).rows == []
+
+
+def test_expire_restarts_the_ttl_for_every_replica(replicas):
+    a, b = replicas
+    a.publish("k", [(2, ["x"])], reset=True, fetched=True)
+    assert b.changes("k", 0).age() < 5
+    b.expire("k", full=True)
+    state = a.changes("k", 0)
+    assert state.fetched_at == 0 and state.full_at == 0
@@ -0,0 +1,146 @@
+"""Snapshot refreshes (delta, change marker) and patching in our own appends."""
+import threading
+
+import pytest
+
+import core.snapshot
+from benchmarks.fake_sheets import FakeOAuthSession
+from benchmarks.run import install, seed_sheets
+from core.schema import REG_HEADERS, REG_ID, REG_SHEET_NAME, marker_cell, marker_col, tail_range
+from core.snapshot import get_snapshot
+from core.writes import WriteQueue
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    session = seed_sheets(10)
+    install(session, FakeOAuthSession("user1@example.com", "User 1"))
+    monkeypatch.setattr(core.snapshot, "get_shared_cache", lambda: None)
+    return session
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Ranges of every batchGet a snapshot refresh makes, one list per request."""
+    seen = []
+    batch_get = core.snapshot.batch_get
+
+    def spy(name, ranges):
+        seen.append([r.split("!", 1)[1] for r in ranges])
+        return batch_get(name, ranges)
+
+    monkeypatch.setattr(core.snapshot, "batch_get", spy)
+    return seen
+
+
+def new_row(i):
+    return [f"New {i}", f"new{i}@example.com", f"97{i:08d}", "No", "Return", "0",
+            "2025-08-02 10:00:00", f"new{i:07d}", "1"]
+
+
+def set_marker(sheets, value):
+    header = sheets.values(REG_SHEET_NAME)[0]
+    header.extend([""] * (marker_col(REG_HEADERS) - len(header)))
+    header[marker_col(REG_HEADERS) - 1] = value
+
+
+def test_expired_snapshot_reads_only_the_marker_and_the_new_rows(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    sheets.values(REG_SHEET_NAME).extend([new_row(1), new_row(2)])  # another process appends
+
+    snap.expire()
+    frame = snap.frame()
+    assert reads[-1] == [marker_cell(REG_HEADERS), tail_range(12, REG_HEADERS)]
+    assert list(frame.index) == list(range(2, 14))
+    assert list(frame.loc[12:, REG_ID]) == ["new0000001", "new0000002"]
+
+
+def test_changed_marker_turns_the_delta_into_a_full_reload(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    sheets.values(REG_SHEET_NAME)[3][2] = "9000000000"  # another process rewrites row 4 ...
+    set_marker(sheets, "elsewhere")                      # ... and bumps the marker
+
+    snap.expire()
+    frame = snap.frame()
+    assert len(reads) == 3  # first load, the delta, then the full reload
+    assert reads[-1][0].startswith("A1:")
+    assert frame.loc[4, "Contact"] == "9000000000"
+
+
+def test_own_append_at_the_next_row_is_patched_in(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    version = snap.apply_appends(12, [new_row(1)])
+    assert version == snap.version
+    assert snap.frame().loc[12, REG_ID] == "new0000001"
+    assert len(reads) == 1
+
+
+def test_own_append_already_read_by_a_tail_refresh_counts_as_applied(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    sheets.values(REG_SHEET_NAME).extend([new_row(1), new_row(2)])  # our append lands ...
+    snap.expire()
+    snap.frame()                                                     # ... a refresh reads it ...
+    version = snap.version
+
+    assert snap.apply_appends(12, [new_row(1), new_row(2)]) == version  # ... then we report it
+    assert len(snap.frame()) == 12
+    assert len(reads) == 2  # no reload
+
+
+def test_own_append_below_different_rows_reloads(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    assert snap.apply_appends(10, [new_row(1)]) is None  # rows 10-11 hold others: some were deleted
+    snap.frame()
+    assert reads[-1][0].startswith("A1:")
+
+
+def test_own_append_past_unseen_rows_waits_for_the_delta(sheets, reads):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    sheets.values(REG_SHEET_NAME).extend([new_row(1), new_row(2)])  # someone else's, then ours
+    assert snap.apply_appends(13, [new_row(2)]) is None
+    frame = snap.frame()
+    assert reads[-1] == [marker_cell(REG_HEADERS), tail_range(12, REG_HEADERS)]
+    assert list(frame.loc[12:, REG_ID]) == ["new0000001", "new0000002"]
+
+
+def test_new_partition_reads_as_empty_and_is_created_by_its_first_write(sheets):
+    snap = get_snapshot(REG_SHEET_NAME, "embroidery-2026-01")
+    assert snap.frame().empty
+    assert sheets.counts()["batchUpdate"] == 0  # reading created no worksheet
+
+    ticket = WriteQueue().append(REG_SHEET_NAME, new_row(1), title="embroidery-2026-01")
+    assert ticket.wait(5) and ticket.error is None
+    assert sheets.values(REG_SHEET_NAME, "embroidery-2026-01") == [REG_HEADERS, new_row(1)]
+    assert list(snap.frame()[REG_ID]) == ["new0000001"]
+
+
+def test_write_patched_in_during_a_refresh_is_kept(sheets, monkeypatch):
+    snap = get_snapshot(REG_SHEET_NAME)
+    snap.frame()
+    batch_get = core.snapshot.batch_get
+    patched, reads = [], []
+
+    def read_while_writing(name, ranges):
+        reads.append(ranges)
+        if len(reads) == 1:
+            # our append lands and reports back while the refresh is reading
+            sheets.values(REG_SHEET_NAME).append(new_row(1))
+            writer = threading.Thread(target=lambda: patched.append(snap.apply_appends(12, [new_row(1)])))
+            writer.start()
+            writer.join(2)
+            assert not writer.is_alive()  # the refresh doesn't hold the snapshot lock
+        return batch_get(name, ranges)
+
+    monkeypatch.setattr(core.snapshot, "batch_get", read_while_writing)
+    snap.expire()
+    frame = snap.frame()
+    assert patched == [snap.version]
+    assert len(reads) == 2  # read again from below the patched-in row
+    assert reads[1][1].endswith(tail_range(13, REG_HEADERS))
+    assert list(frame.index) == list(range(2, 13))
@@ -0,0 +1,111 @@
+"""SQLite backend: frames, compare-and-set updates and the sheet mirror."""
+import pytest
+
+import core.snapshot
+from benchmarks.fake_sheets import FakeOAuthSession, FakeSheetsSession
+from benchmarks.run import install, seed_sheets
+from core.schema import REG_HEADERS, REG_ID, REG_SHEET_NAME, REG_VERSION, USER_HEADERS, USER_SHEET_NAME
+from core.storage.sqlite_backend import SqliteStorage
+from core.storage.sync import mirror_to_sheets, seed_from_sheets
+from core.writes import WriteConflict
+
+EVENT = "embroidery-2025-08"  # on the first sheet
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteStorage(str(tmp_path / "billing.sqlite3"))
+
+
+def install_sheets(monkeypatch, session):
+    install(session, FakeOAuthSession("user1@example.com", "User 1"))
+    monkeypatch.setattr(core.snapshot, "get_shared_cache", lambda: None)
+    return session
+
+
+def reg(i, email=None):
+    return [f"User {i}", email or f"user{i}@example.com", f"98{i:08d}", "Yes", "Return", 0,
+            "2025-08-01 10:00:00"]
+
+
+# ---- storage -----------------------------------------------------
+def test_appended_registrations_get_an_id_and_version_1(store):
+    tickets = store.append_regs(EVENT, [reg(1), reg(2)])
+    assert all(t.done and t.error is None for t in tickets)
+    regs = store.load_regs(EVENT)
+    assert set(REG_HEADERS) <= set(regs.columns)
+    assert list(regs[REG_ID]) == [t.values[7] for t in tickets]
+    assert list(regs[REG_VERSION]) == [1, 1]
+
+
+def test_lookups_normalize_the_email(store):
+    store.append_reg(EVENT, reg(1, "Mixed.Case@Example.com"))
+    store.save_user("Mixed.Case@Example.com", "Mixed")
+    store.save_user("mixed.case@example.com ", "Renamed")  # same user: updated, not added
+    assert len(store.find_regs(EVENT, "mixed.case@example.com")) == 1
+    assert store.user_exists("MIXED.CASE@example.com")
+    assert list(store.load_users()["Name"]) == ["Renamed"]
+    assert store.reg_exists(EVENT, *reg(1, "mixed.case@example.com")[:5])
+    assert not store.reg_exists(EVENT, *reg(2)[:5])
+
+
+def test_update_at_the_current_version_bumps_it(store):
+    reg_id = store.append_reg(EVENT, reg(1)).values[7]
+    ticket = store.update_reg(EVENT, reg_id, 1, reg(1)[:2] + ["9000000000"] + reg(1)[3:])
+    assert ticket.error is None
+    row = store.load_regs(EVENT).iloc[0]
+    assert (row["Contact"], row[REG_VERSION]) == ("9000000000", 2)
+
+
+def test_update_at_a_stale_version_conflicts_and_leaves_the_row(store):
+    reg_id = store.append_reg(EVENT, reg(1)).values[7]
+    assert store.update_reg(EVENT, reg_id, 1, reg(1)).error is None
+    ticket = store.update_reg(EVENT, reg_id, 1, reg(1)[:2] + ["9000000000"] + reg(1)[3:])
+    assert isinstance(ticket.error, WriteConflict)
+    row = store.load_regs(EVENT).iloc[0]
+    assert (row["Contact"], row[REG_VERSION]) == (reg(1)[2], 2)
+
+
+def test_update_of_an_unknown_id_is_not_a_conflict(store):
+    ticket = store.update_reg(EVENT, "nosuchid00", 1, reg(1))
+    assert isinstance(ticket.error, KeyError)
+
+
+# ---- sync --------------------------------------------------------
+def test_mirror_writes_changed_tables_only(monkeypatch, store):
+    session = FakeSheetsSession()
+    session.add_spreadsheet(USER_SHEET_NAME, [USER_HEADERS])
+    session.add_spreadsheet(REG_SHEET_NAME, [REG_HEADERS])
+    install_sheets(monkeypatch, session)
+    store.append_regs(EVENT, [reg(1), reg(2)])
+
+    assert mirror_to_sheets(store) == {"registrations": 2}
+    rows = session.values(REG_SHEET_NAME)
+    assert rows[0] == REG_HEADERS
+    assert rows[1:] == store.export_rows("registrations", EVENT)
+    assert mirror_to_sheets(store) == {}  # nothing changed since
+
+
+def test_mirror_clears_rows_left_from_a_longer_sync(monkeypatch, store):
+    session = install_sheets(monkeypatch, seed_sheets(5))
+    store.mark_synced("registrations", 0, 5)  # the sheet holds the last mirror's 5 rows
+    store.append_regs(EVENT, [reg(1), reg(2)])
+
+    mirror_to_sheets(store)
+    rows = session.values(REG_SHEET_NAME)
+    assert rows[1:3] == store.export_rows("registrations", EVENT)
+    assert all(not any(r) for r in rows[3:6])
+    assert store.sync_state("registrations")[2] == 2
+
+
+def test_seed_copies_the_sheets_into_an_empty_database(monkeypatch, store):
+    session = install_sheets(monkeypatch, seed_sheets(10))
+    seed_from_sheets(store)
+    regs = store.load_regs(EVENT)
+    assert list(regs[REG_ID]) == [r[7] for r in session.values(REG_SHEET_NAME)[1:]]
+    assert set(regs[REG_VERSION]) == {1}
+    assert len(store.load_users()) == len(session.values(USER_SHEET_NAME)) - 1
+
+    session.values(REG_SHEET_NAME).append(reg(99) + ["late0000000", "1"])
+    seed_from_sheets(store)  # only ever into an empty database
+    assert len(store.load_regs(EVENT)) == 10
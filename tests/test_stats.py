@@ -0,0 +1,28 @@
+"""Organizer totals kept incrementally agree with a rebuild from the frame."""
+import pandas as pd
+
+from core.frames import typed
+from core.index import RegistrationStats
+from core.schema import REG_HEADERS
+
+
+def test_stats_kept_incrementally_match_a_rebuild():
+    rows = [
+        ["Ann", "ann@x.com", "1", "Yes", "Buy", "200", "2025-08-01 10:00:00", "a", "1"],
+        ["Bob", "bob@x.com", "2", "No", "Return", "0", "2025-08-01 11:00:00", "b", "1"],
+    ]
+    frame = typed(pd.DataFrame(rows, columns=REG_HEADERS, index=[2, 3]))
+    stats = RegistrationStats.build(frame)
+
+    added = ["Ann", "ANN@x.com ", "3", "", "Buy", "200", "2025-08-02 09:00:00", "c", "1"]
+    stats.on_append(4, dict(zip(REG_HEADERS, added)))
+    changed = rows[1][:3] + ["Yes", "Buy", "200"] + rows[1][6:]
+    stats.on_update(3, frame.loc[3].to_dict(), dict(zip(REG_HEADERS, changed)))
+
+    rebuilt = RegistrationStats.build(
+        typed(pd.DataFrame([rows[0], changed, added], columns=REG_HEADERS, index=[2, 3, 4]))
+    ).summary()
+    summary = stats.summary()
+    assert summary.pop("by_day").to_dict() == rebuilt.pop("by_day").to_dict()
+    assert summary == rebuilt
+    assert summary["attendees"] == 2 and summary["pending_total"] == 600
@@ -0,0 +1,92 @@
+"""Compare-and-set updates through the write queue, on the fake Sheets API."""
+import pytest
+
+import core.snapshot
+import core.storage.sheets_backend
+from benchmarks.fake_sheets import FakeOAuthSession, FakeSheetsSession
+from benchmarks.run import install, seed_sheets
+from core.schema import REG_HEADERS, REG_ID, REG_SHEET_NAME, REG_VERSION
+from core.snapshot import get_snapshot
+from core.storage.sheets_backend import SheetsStorage
+from core.writes import WriteConflict, WriteQueue
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    session = seed_sheets(10)
+    install(session, FakeOAuthSession("user1@example.com", "User 1"))
+    monkeypatch.setattr(core.snapshot, "get_shared_cache", lambda: None)
+    return session
+
+
+def edited(row, version):
+    return row[:7] + [row[7], str(version)]
+
+
+def test_conditional_update_writes_when_the_row_is_unchanged(sheets):
+    row = list(sheets.values(REG_SHEET_NAME)[1])
+    ticket = WriteQueue().update(REG_SHEET_NAME, 2, edited(row, 2), expect={REG_ID: row[7], REG_VERSION: 1})
+    assert ticket.wait(5) and ticket.error is None
+    assert sheets.values(REG_SHEET_NAME)[1][8] == "2"
+    assert get_snapshot(REG_SHEET_NAME).frame().loc[2, REG_VERSION] == 2
+
+
+def test_edit_by_another_process_conflicts_within_the_cache_ttl(sheets):
+    rows = sheets.values(REG_SHEET_NAME)
+    original = list(rows[1])
+    assert get_snapshot(REG_SHEET_NAME).frame().loc[2, REG_VERSION] == 1  # cached, fresh
+    rows[1] = edited(original, 2)  # another replica's edit, not yet in our snapshot
+
+    ticket = WriteQueue().update(REG_SHEET_NAME, 2, edited(original, 2),
+                                 expect={REG_ID: original[7], REG_VERSION: 1})
+    assert ticket.wait(5)
+    assert isinstance(ticket.error, WriteConflict)
+    assert sheets.values(REG_SHEET_NAME)[1] == edited(original, 2)
+    assert sheets.counts()["values.batchUpdate"] == 0
+
+
+def test_second_update_of_a_row_in_one_batch_conflicts(sheets):
+    row = list(sheets.values(REG_SHEET_NAME)[1])
+    queue = WriteQueue(flush_interval=60)
+    first = queue.update(REG_SHEET_NAME, 2, edited(row, 2), expect={REG_ID: row[7], REG_VERSION: 1})
+    second = queue.update(REG_SHEET_NAME, 2, edited(row, 2), expect={REG_ID: row[7], REG_VERSION: 1})
+    queue.flush()
+    assert first.error is None
+    assert isinstance(second.error, WriteConflict)
+
+
+# ---- rows written before registration ids ------------------------
+LEGACY_EVENT = "embroidery-2025-08"  # kept on the first sheet
+
+
+@pytest.fixture
+def legacy(monkeypatch):
+    session = FakeSheetsSession()
+    session.add_spreadsheet(REG_SHEET_NAME, [REG_HEADERS] + [
+        [f"User {i}", f"u{i}@x.com", f"98000000{i}", "No", "Return", "0", "2025-08-01 10:00:00"]
+        for i in range(1, 5)
+    ])
+    install(session, FakeOAuthSession("u1@x.com", "User 1"))
+    monkeypatch.setattr(core.snapshot, "get_shared_cache", lambda: None)
+    monkeypatch.setattr(core.storage.sheets_backend, "get_journal", lambda: None)
+    return session
+
+
+def test_legacy_edit_after_a_row_deleted_by_hand_conflicts(legacy):
+    storage = SheetsStorage()
+    regs = storage.find_regs(LEGACY_EVENT, "u2@x.com")
+    assert list(regs[REG_ID]) == ["@3"]
+    del legacy.values(REG_SHEET_NAME)[1]  # u1's row removed: u3 is on row 3 now
+
+    row = ["User 2", "u2@x.com", "980000002", "Yes", "Buy", "200", "2025-08-02 10:00:00"]
+    ticket = storage.update_reg(LEGACY_EVENT, "@3", 0, row)
+    assert ticket.wait(5)
+    assert isinstance(ticket.error, WriteConflict)
+    assert legacy.values(REG_SHEET_NAME)[2][:2] == ["User 3", "u3@x.com"]
+
+    # the conflict reloads the whole sheet, so the retry finds u2's row
+    regs = storage.find_regs(LEGACY_EVENT, "u2@x.com")
+    assert list(regs[REG_ID]) == ["@2"]
+    ticket = storage.update_reg(LEGACY_EVENT, "@2", 0, row)
+    assert ticket.wait(5) and ticket.error is None
+    assert legacy.values(REG_SHEET_NAME)[1][:4] == ["User 2", "u2@x.com", "980000002", "Yes"]